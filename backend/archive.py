@@ -0,0 +1,162 @@
+"""
+Scan history archival
+Closed days are moved out of scan_history into monthly archive tables
+(scan_history_archive_YYYY_MM), so the hot table and its indexes only hold
+recent days. Historical reporting reads the scan_history_all view, which
+covers the hot table and every archive table.
+"""
+
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from database import Database, SCAN_ARCHIVE_PREFIX
+
+# Days kept in scan_history, counting today
+DEFAULT_HOT_DAYS = 7
+# Scans moved per transaction; each batch holds the write lock only briefly,
+# so scans queued behind it do not run into the busy timeout
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def archive_table_name(scan_date: date) -> str:
+    """Archive table holding scans from scan_date's month"""
+    return f"{SCAN_ARCHIVE_PREFIX}{scan_date.year:04d}_{scan_date.month:02d}"
+
+
+def _ensure_archive_table(cursor: sqlite3.Cursor, table: str) -> bool:
+    """
+    Create an archive table matching scan_history, or add columns it is missing
+    Returns: True if anything changed
+    """
+    cursor.execute("PRAGMA table_info(scan_history)")
+    columns = [(row['name'], row['type']) for row in cursor.fetchall()]
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row['name'] for row in cursor.fetchall()}
+
+    if not existing:
+        # Row ids are kept from scan_history, which never reuses them
+        definitions = ", ".join(
+            f"{name} INTEGER PRIMARY KEY" if name == "id" else f"{name} {col_type}"
+            for name, col_type in columns
+        )
+        cursor.execute(f"CREATE TABLE {table} ({definitions})")
+        cursor.execute(f"CREATE INDEX {table}_member ON {table}(member_id, scan_date, is_valid, scanned_at, gateway_id)")
+        cursor.execute(f"CREATE INDEX {table}_date ON {table}(scan_date, gateway_id)")
+        return True
+
+    missing = [(name, col_type) for name, col_type in columns if name not in existing]
+    for name, col_type in missing:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+    return bool(missing)
+
+
+def archive_closed_days(db: Database, hot_days: int = DEFAULT_HOT_DAYS,
+                        batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict:
+    """
+    Move scans older than the last hot_days days (counting today) into the
+    archive tables, in row id ranges of batch_size per transaction so scans
+    are only briefly blocked
+    Returns: {"archivedRows", "days", "tables", "before"}
+    """
+    if hot_days < 1:
+        raise ValueError("hotDays must be at least 1; today's scans are never archived")
+    before = datetime.now().date() - timedelta(days=hot_days - 1)
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT scan_date FROM scan_history
+            WHERE scan_date < ? ORDER BY scan_date
+        """, (before.isoformat(),))
+        days = [row['scan_date'] for row in cursor.fetchall()]
+
+    archived_rows = 0
+    tables: List[str] = []
+    for day in days:
+        table = archive_table_name(date.fromisoformat(day))
+        with db.get_connection() as conn, db.write_lock:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            if _ensure_archive_table(cursor, table):
+                db._refresh_scan_history_view(cursor)
+            cursor.execute("""
+                SELECT MIN(id) as first_id, MAX(id) as last_id FROM scan_history WHERE scan_date = ?
+            """, (day,))
+            bounds = cursor.fetchone()
+            conn.commit()
+
+        # Closed days only gain rows from replayed offline scans; any added
+        # after the bounds were read are moved by the next run
+        first_id = bounds['first_id']
+        while first_id is not None and first_id <= bounds['last_id']:
+            last_id = min(first_id + batch_size - 1, bounds['last_id'])
+            archived_rows += _move_scans(db, table, day, first_id, last_id)
+            first_id = last_id + 1
+        if table not in tables:
+            tables.append(table)
+
+    return {
+        "archivedRows": archived_rows,
+        "days": len(days),
+        "tables": tables,
+        "before": before.isoformat()
+    }
+
+
+def _move_scans(db: Database, table: str, day: str, first_id: int, last_id: int) -> int:
+    """Move one day's scans with ids in [first_id, last_id] in one transaction"""
+    with db.get_connection() as conn, db.write_lock:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("PRAGMA table_info(scan_history)")
+        columns = ", ".join(row['name'] for row in cursor.fetchall())
+        cursor.execute(f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM scan_history
+            WHERE id BETWEEN ? AND ? AND scan_date = ?
+        """, (first_id, last_id, day))
+        moved = cursor.rowcount
+        cursor.execute("""
+            DELETE FROM scan_history WHERE id BETWEEN ? AND ? AND scan_date = ?
+        """, (first_id, last_id, day))
+        conn.commit()
+    return moved
+
+
+def get_archive_status(db: Database) -> Dict:
+    """Get row counts and date ranges of the hot table and each archive table"""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) as row_count, MIN(scan_date) as first_date, MAX(scan_date) as last_date
+            FROM scan_history
+        """)
+        hot = cursor.fetchone()
+
+        cursor.execute("""
+            SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?
+            ORDER BY name
+        """, (SCAN_ARCHIVE_PREFIX + '*',))
+        archives = []
+        for table in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute(f"""
+                SELECT COUNT(*) as row_count, MIN(scan_date) as first_date, MAX(scan_date) as last_date
+                FROM {table}
+            """)
+            row = cursor.fetchone()
+            archives.append({
+                "table": table,
+                "rows": row['row_count'],
+                "firstDate": row['first_date'],
+                "lastDate": row['last_date']
+            })
+
+    return {
+        "hot": {
+            "rows": hot['row_count'],
+            "firstDate": hot['first_date'],
+            "lastDate": hot['last_date']
+        },
+        "archives": archives
+    }
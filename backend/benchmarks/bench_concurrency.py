@@ -0,0 +1,81 @@
+"""
+Benchmark: /api/scan latency while /api/stats and /api/download run concurrently
+
+Drives the app in-process over ASGI, so any handler that blocks the event
+loop shows up directly in scan latency.
+
+    python benchmarks/bench_concurrency.py --members 20000 --scans 500
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from common import use_temp_database, seed_members, percentiles
+
+
+async def scan_loop(client, qr_codes, count, gateway_id="GATEWAY-001"):
+    samples = []
+    for qr_code_id in qr_codes[:count]:
+        started = time.perf_counter()
+        response = await client.post("/api/scan", json={"qrId": qr_code_id, "gatewayId": gateway_id})
+        samples.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return samples
+
+
+async def background_load(client, stop: asyncio.Event, path: str, counter: dict):
+    while not stop.is_set():
+        response = await client.get(path)
+        response.raise_for_status()
+        counter[path] = counter.get(path, 0) + 1
+
+
+async def run(args):
+    import httpx
+    import main
+
+    qr_codes = seed_members(main.db, args.members)
+    main.db.warm_member_cache()
+    main.db.load_scan_ledger()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Baseline: scans with nothing else running
+        idle = await scan_loop(client, qr_codes, args.scans)
+
+        # Same number of scans while dashboards and exports hammer the server
+        stop = asyncio.Event()
+        counter = {}
+        load = [asyncio.create_task(background_load(client, stop, "/api/stats", counter))
+                for _ in range(args.stats_clients)]
+        load += [asyncio.create_task(background_load(client, stop, "/api/download", counter))
+                 for _ in range(args.download_clients)]
+        await asyncio.sleep(0.1)
+        loaded = await scan_loop(client, qr_codes[args.scans:], args.scans, gateway_id="GATEWAY-002")
+        stop.set()
+        await asyncio.gather(*load)
+
+    return {
+        "members": args.members,
+        "scanIdle": percentiles(idle),
+        "scanUnderLoad": percentiles(loaded),
+        "backgroundRequests": counter
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--scans", type=int, default=500)
+    parser.add_argument("--stats-clients", type=int, default=2)
+    parser.add_argument("--download-clients", type=int, default=1)
+    args = parser.parse_args()
+
+    use_temp_database("concurrency")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,298 @@
+"""
+Benchmark: scan, upload and stats endpoints under concurrent gateway load
+
+Seeds a synthetic roster and scan history, then simulates gateways scanning
+members concurrently while dashboards poll /api/stats, followed by member
+uploads. Reports throughput and latency percentiles per endpoint as JSON.
+The app runs in-process over ASGI (--mode inprocess) or as a local uvicorn
+server (--mode uvicorn), which includes HTTP parsing and the network stack.
+
+    python benchmarks/bench_load.py --members 100000 --gateways 10 --output run.json
+    python benchmarks/bench_load.py --members 100000 --gateways 10 --baseline run.json
+
+With --baseline, endpoints whose p95 latency rose or throughput fell by more
+than --tolerance are reported as regressions and the exit status is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from common import (BACKEND_DIR, members_csv, percentiles, seed_members,
+                    seed_scan_history, use_temp_database)
+
+
+class EndpointRecorder:
+    """Latency samples and status counts per endpoint"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.windows: Dict[str, List[float]] = {}
+
+    async def request(self, client, method: str, path: str, name: str = None,
+                      expected=(200,), **kwargs):
+        name = name or f"{method} {path.split('?')[0]}"
+        started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        finished = time.perf_counter()
+
+        self.samples.setdefault(name, []).append(finished - started)
+        statuses = self.statuses.setdefault(name, {})
+        key = str(response.status_code) if response.status_code in expected else "errors"
+        statuses[key] = statuses.get(key, 0) + 1
+        window = self.windows.setdefault(name, [started, finished])
+        window[0] = min(window[0], started)
+        window[1] = max(window[1], finished)
+        return response
+
+    def report(self) -> Dict:
+        report = {}
+        for name, samples in sorted(self.samples.items()):
+            elapsed = self.windows[name][1] - self.windows[name][0]
+            report[name] = {
+                **percentiles(samples),
+                "throughputPerSecond": round(len(samples) / elapsed, 1) if elapsed else None,
+                "statuses": self.statuses[name]
+            }
+        return report
+
+
+async def gateway_loop(recorder: EndpointRecorder, client, gateway_id: str,
+                       members: List[str], scanned: List[str], duplicate_rate: float,
+                       rng: random.Random):
+    for qr_code_id in members:
+        # Rescan a member that has already been through a gate now and then,
+        # which exercises the rejection path
+        if scanned and rng.random() < duplicate_rate:
+            qr_code_id = rng.choice(scanned)
+        await recorder.request(client, "POST", "/api/scan", expected=(200, 400),
+                               json={"qrId": qr_code_id, "gatewayId": gateway_id})
+        scanned.append(qr_code_id)
+
+
+async def dashboard_loop(recorder: EndpointRecorder, client, stop: asyncio.Event,
+                         gateway_id: Optional[str]):
+    query = f"&gatewayId={gateway_id}" if gateway_id else ""
+    while not stop.is_set():
+        await recorder.request(client, "GET", f"/api/stats?limit=50{query}")
+        await recorder.request(client, "GET", f"/api/stats/summary?{query.lstrip('&')}")
+
+
+async def upload_round(recorder: EndpointRecorder, client, rows: int, start: int) -> Dict:
+    started = time.perf_counter()
+    response = await recorder.request(
+        client, "POST", "/api/upload?gatewayId=GATEWAY-001",
+        files={"file": ("members.csv", members_csv(rows, start), "text/csv")}
+    )
+    batch_id = response.json()['batchId']
+    while True:
+        status = (await client.get(f"/api/upload/{batch_id}/status")).json()
+        if status['status'] in ("completed", "failed"):
+            break
+        await asyncio.sleep(0.05)
+    return {"seconds": time.perf_counter() - started, "status": status['status'],
+            "successful": status.get('successful')}
+
+
+async def run_load(client, args, qr_codes: List[str]) -> Dict:
+    recorder = EndpointRecorder()
+    rng = random.Random(args.seed)
+
+    # Each gateway scans its own share of members not scanned today
+    fresh = qr_codes[:]
+    rng.shuffle(fresh)
+    scanned: List[str] = []
+    gateways = [
+        gateway_loop(recorder, client, f"GATEWAY-{n + 1:03d}",
+                     fresh[n * args.scans:(n + 1) * args.scans],
+                     scanned, args.duplicate_rate, random.Random(args.seed + n))
+        for n in range(args.gateways)
+    ]
+    stop = asyncio.Event()
+    dashboards = [
+        asyncio.create_task(dashboard_loop(recorder, client, stop,
+                                           None if n % 2 == 0 else "GATEWAY-001"))
+        for n in range(args.stats_clients)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*gateways)
+    scan_seconds = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*dashboards)
+
+    uploads = []
+    for n in range(args.uploads):
+        uploads.append(await upload_round(recorder, client, args.upload_rows,
+                                          len(qr_codes) + n * args.upload_rows))
+
+    upload_seconds = [upload['seconds'] for upload in uploads]
+    return {
+        "scanPhaseSeconds": round(scan_seconds, 3),
+        "endpoints": recorder.report(),
+        "uploadJobs": {
+            **percentiles(upload_seconds),
+            "rowsPerSecond": round(args.upload_rows * len(uploads) / sum(upload_seconds), 1)
+            if uploads else None,
+            "failed": sum(1 for upload in uploads if upload['status'] != "completed")
+        }
+    }
+
+
+@asynccontextmanager
+async def inprocess_client():
+    import httpx
+    import main
+
+    # ASGITransport does not run the lifespan, which warms the caches
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            yield client
+
+
+@asynccontextmanager
+async def uvicorn_client(workers: int = 1):
+    import httpx
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # WEB_CONCURRENCY also switches the app into multi-worker mode
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "WEB_CONCURRENCY": str(workers)}
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+            deadline = time.monotonic() + 300
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start within 300 seconds")
+                await asyncio.sleep(0.2)
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> Dict:
+    """
+    Compare endpoint p95 latency and throughput against a baseline run
+    Returns: {"endpoints": {...}, "regressions": [...], "configMismatch": {...}}
+    """
+    comparison = {"endpoints": {}, "regressions": [], "configMismatch": {}}
+    for key, value in result['config'].items():
+        if baseline.get('config', {}).get(key) != value:
+            comparison['configMismatch'][key] = [baseline.get('config', {}).get(key), value]
+
+    for name, current in result['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or not previous.get('count') or not current.get('count'):
+            continue
+        p95_change = current['p95Ms'] / previous['p95Ms'] - 1 if previous['p95Ms'] else 0.0
+        throughput_change = (current['throughputPerSecond'] / previous['throughputPerSecond'] - 1
+                             if previous['throughputPerSecond'] else 0.0)
+        comparison['endpoints'][name] = {
+            "p95Ms": [previous['p95Ms'], current['p95Ms']],
+            "p95Change": round(p95_change, 3),
+            "throughputPerSecond": [previous['throughputPerSecond'], current['throughputPerSecond']],
+            "throughputChange": round(throughput_change, 3)
+        }
+        if p95_change > tolerance or throughput_change < -tolerance:
+            comparison['regressions'].append(name)
+    return comparison
+
+
+async def run(args) -> Dict:
+    from database import Database
+
+    use_temp_database("load")
+    # Seed before the app opens the database so both modes start identically
+    db = Database(os.environ["DB_PATH"])
+    started = time.perf_counter()
+    qr_codes = seed_members(db, args.members)
+    for n in range(2, args.gateways + 1):
+        db.register_gateway(f"GATEWAY-{n:03d}", f"Gateway {n}")
+    history = seed_scan_history(db, qr_codes, args.history_days, gateways=args.gateways)
+    seed_seconds = time.perf_counter() - started
+    db.close()
+
+    client_context = inprocess_client() if args.mode == "inprocess" else uvicorn_client(args.workers)
+    async with client_context as client:
+        load = await run_load(client, args, qr_codes)
+
+    return {
+        "config": {
+            "mode": args.mode,
+            "members": args.members,
+            "historyDays": args.history_days,
+            "gateways": args.gateways,
+            "scansPerGateway": args.scans,
+            "duplicateRate": args.duplicate_rate,
+            "statsClients": args.stats_clients,
+            "uploads": args.uploads,
+            "uploadRows": args.upload_rows,
+            "workers": args.workers if args.mode == "uvicorn" else 1
+        },
+        "seed": {"historyScans": history, "seconds": round(seed_seconds, 3)},
+        **load
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--history-days", type=int, default=7)
+    parser.add_argument("--gateways", type=int, default=10)
+    parser.add_argument("--scans", type=int, default=200, help="scans per gateway")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--stats-clients", type=int, default=2)
+    parser.add_argument("--uploads", type=int, default=2)
+    parser.add_argument("--upload-rows", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the result JSON to this file (e.g. to use as a baseline)")
+    parser.add_argument("--baseline", help="Compare against a previous result JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative p95 increase / throughput decrease")
+    args = parser.parse_args()
+    if args.gateways * args.scans > args.members:
+        parser.error("--members must be at least --gateways x --scans")
+
+    result = asyncio.run(run(args))
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as fileobj:
+            result['comparison'] = compare(result, json.load(fileobj), args.tolerance)
+        status = 1 if result['comparison']['regressions'] else 0
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as fileobj:
+            fileobj.write(output + "\n")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,92 @@
+"""
+Benchmark: sustained /api/scan throughput for each scan write mode
+
+Runs concurrent gateways against the app in-process, scanning members not
+yet scanned today, once per scan write mode (sync, commit, early) and
+storage profile, and reports scans per second, latency percentiles and the
+average group commit size.
+
+    python benchmarks/bench_scan_writer.py --members 50000 --gateways 32 --scans 300
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from common import percentiles, seed_members, use_temp_database
+
+
+async def gateway_loop(client, gateway_id: str, qr_codes, samples):
+    for qr_code_id in qr_codes:
+        started = time.perf_counter()
+        response = await client.post("/api/scan", json={"qrId": qr_code_id, "gatewayId": gateway_id})
+        samples.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+
+async def run(args):
+    import httpx
+    import main
+
+    qr_codes = seed_members(main.db, args.members)
+    for n in range(2, args.gateways + 1):
+        main.db.register_gateway(f"GATEWAY-{n:03d}", f"Gateway {n}")
+
+    results = []
+    offset = 0
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for profile in args.profiles:
+                main.db.set_storage_profile(profile)
+                for mode in args.modes:
+                    main.scan_writer.mode = mode
+                    groups, committed = main.scan_writer.groups, main.scan_writer.committed
+                    samples = []
+                    started = time.perf_counter()
+                    await asyncio.gather(*(
+                        gateway_loop(client, f"GATEWAY-{n + 1:03d}",
+                                     qr_codes[offset + n * args.scans:offset + (n + 1) * args.scans], samples)
+                        for n in range(args.gateways)
+                    ))
+                    elapsed = time.perf_counter() - started
+                    offset += args.gateways * args.scans
+                    groups = main.scan_writer.groups - groups
+                    results.append({
+                        "storageProfile": profile,
+                        "mode": mode,
+                        "scansPerSecond": round(len(samples) / elapsed, 1),
+                        **percentiles(samples),
+                        "averageGroupSize": round((main.scan_writer.committed - committed) / groups, 2)
+                        if groups and mode != "sync" else None
+                    })
+
+    return {
+        "config": {
+            "members": args.members,
+            "gateways": args.gateways,
+            "scansPerGateway": args.scans
+        },
+        "runs": results
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--gateways", type=int, default=32)
+    parser.add_argument("--scans", type=int, default=200, help="scans per gateway and run")
+    parser.add_argument("--modes", default="sync,commit,early", type=lambda value: value.split(","))
+    parser.add_argument("--profiles", default="durable,balanced", type=lambda value: value.split(","))
+    args = parser.parse_args()
+    runs = len(args.modes) * len(args.profiles)
+    if args.gateways * args.scans * runs > args.members:
+        parser.error("--members must be at least --gateways x --scans x runs")
+
+    use_temp_database("scan_writer")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
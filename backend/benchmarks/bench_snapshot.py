@@ -0,0 +1,79 @@
+"""
+Benchmark: validation snapshot build time, size and local lookup rate
+
+Builds a snapshot from a synthetic roster (with part of it scanned today),
+memory-maps it and measures lookups and full scan validations per second.
+
+    python benchmarks/bench_snapshot.py --members 200000 --lookups 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from common import use_temp_database, seed_members
+
+
+def run(args):
+    from database import Database
+    from snapshot import SnapshotReader, build_snapshot
+
+    work_dir = use_temp_database("snapshot")
+    db = Database(os.environ["DB_PATH"])
+    qr_codes = seed_members(db, args.members)
+    for qr_code_id in qr_codes[:args.scanned]:
+        db.process_scan(qr_code_id, "GATEWAY-001")
+
+    path = os.path.join(work_dir, "members.snapshot")
+    started = time.perf_counter()
+    with open(path, "wb") as fileobj:
+        meta = build_snapshot(db, fileobj)
+    build_seconds = time.perf_counter() - started
+    db.close()
+
+    rng = random.Random(7)
+    hits = [rng.choice(qr_codes) for _ in range(args.lookups)]
+    misses = [f"MISSING{n:08d}" for n in range(args.lookups)]
+
+    with SnapshotReader(path) as reader:
+        started = time.perf_counter()
+        for qr_code_id in hits:
+            reader.lookup(qr_code_id)
+        hit_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for qr_code_id in misses:
+            reader.lookup(qr_code_id)
+        miss_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for qr_code_id in hits:
+            reader.validate(qr_code_id, "GATEWAY-002")
+        validate_seconds = time.perf_counter() - started
+
+    return {
+        "members": args.members,
+        "scannedToday": meta['scannedToday'],
+        "snapshotBytes": meta['bytes'],
+        "bytesPerMember": round(meta['bytes'] / max(args.members, 1), 1),
+        "buildSeconds": round(build_seconds, 3),
+        "lookupHitsPerSecond": round(args.lookups / hit_seconds),
+        "lookupMissesPerSecond": round(args.lookups / miss_seconds),
+        "validationsPerSecond": round(args.lookups / validate_seconds),
+        "validateMeanMicros": round(validate_seconds / args.lookups * 1e6, 2)
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=200000)
+    parser.add_argument("--scanned", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
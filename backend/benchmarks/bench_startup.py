@@ -0,0 +1,113 @@
+"""
+Benchmark: cold start time of the backend
+
+Seeds a roster, then starts fresh Python processes that import main, run
+the app's startup and serve a first /api/health request, and reports how
+long each step took. Each process is run three ways: as the app starts now,
+with pandas imported eagerly as it used to be, and with the schema stamp
+cleared so init_database runs its full DDL. Also times init_database alone
+with and without the schema fast path.
+
+    python benchmarks/bench_startup.py --members 100000 --runs 10
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from common import BACKEND_DIR, percentiles, seed_members, use_temp_database
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+if sys.argv[1] == "eager-pandas":
+    import pandas, openpyxl
+import main
+imported = time.perf_counter()
+
+async def first_request():
+    import httpx
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.get("/api/health")).raise_for_status()
+        return ready, time.perf_counter()
+
+ready, responded = asyncio.run(first_request())
+print(json.dumps({
+    "import": imported - started,
+    "lifespan": ready - imported,
+    "firstResponse": responded - started
+}))
+"""
+
+VARIANTS = ["lazy", "eager-pandas", "full-schema-check"]
+
+
+def run_child(variant: str, db_path: str) -> dict:
+    if variant == "full-schema-check":
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA user_version = 0")
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD, variant], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+
+def time_init_database(db, runs: int) -> dict:
+    results = {}
+    for name, force in (("stamped", False), ("forced", True)):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            db.init_database(force=force)
+            samples.append(time.perf_counter() - started)
+        results[name] = percentiles(samples)
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=5, help="processes started per variant")
+    parser.add_argument("--variants", default=",".join(VARIANTS), type=lambda value: value.split(","))
+    args = parser.parse_args()
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+
+    use_temp_database("startup")
+    db_path = os.environ["DB_PATH"]
+    from database import Database
+
+    db = Database(db_path)
+    seed_members(db, args.members)
+    init_database = time_init_database(db, max(args.runs, 20))
+    db.close()
+
+    runs = {}
+    for variant in args.variants:
+        # One unmeasured start so every variant runs with a warm page cache
+        run_child(variant, db_path)
+        samples = [run_child(variant, db_path) for _ in range(args.runs)]
+        runs[variant] = {
+            step: percentiles([sample[step] for sample in samples])
+            for step in ("process", "import", "lifespan", "firstResponse")
+        }
+
+    print(json.dumps({
+        "config": {"members": args.members, "runs": args.runs},
+        "initDatabase": init_database,
+        "runs": runs
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,149 @@
+"""
+Benchmark: scan throughput as uvicorn worker processes are added
+
+For each worker count, seeds a fresh roster, starts uvicorn with
+WEB_CONCURRENCY set to that count and drives /api/scan from several client
+processes (so the load generator is not the bottleneck). Reports scans per
+second, latency percentiles and scaling efficiency relative to one worker.
+
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --members 100000
+
+Writes still go through SQLite's single write lock, so scaling flattens once
+commits rather than request handling dominate; compare storage profiles with
+--storage-profile.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, List
+
+from common import percentiles, seed_members, use_temp_database
+from bench_load import uvicorn_client
+
+
+async def _client_scans(base_url: str, gateways: Dict[str, List[str]], connections: int) -> Dict:
+    import httpx
+
+    samples: List[float] = []
+    statuses: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        async def gateway(gateway_id: str, qr_codes: List[str]):
+            for qr_code_id in qr_codes:
+                started = time.perf_counter()
+                response = await client.post("/api/scan", json={"qrId": qr_code_id, "gatewayId": gateway_id})
+                samples.append(time.perf_counter() - started)
+                key = str(response.status_code)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        await asyncio.gather(*(gateway(gateway_id, qr_codes) for gateway_id, qr_codes in gateways.items()))
+    return {"samples": samples, "statuses": statuses}
+
+
+def client_process(args) -> Dict:
+    """Entry point of one load generator process"""
+    return asyncio.run(_client_scans(*args))
+
+
+async def measure(workers: int, args, qr_codes: List[str]) -> Dict:
+    rng = random.Random(args.seed)
+    fresh = qr_codes[:]
+    rng.shuffle(fresh)
+
+    # Every client process runs its share of the gateways, each scanning
+    # members nobody has scanned today
+    jobs = [{} for _ in range(args.client_processes)]
+    for n in range(args.gateways):
+        jobs[n % args.client_processes][f"GATEWAY-{n + 1:03d}"] = fresh[n * args.scans:(n + 1) * args.scans]
+
+    async with uvicorn_client(workers) as client:
+        base_url = str(client.base_url)
+        # Warm up each worker's connection pool and code paths
+        await asyncio.gather(*(client.get("/api/stats/summary") for _ in range(workers * 4)))
+
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(args.client_processes) as pool:
+            started = time.perf_counter()
+            results = pool.map(client_process, [(base_url, job, args.connections) for job in jobs if job])
+            elapsed = time.perf_counter() - started
+
+    samples = [sample for result in results for sample in result['samples']]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        for key, count in result['statuses'].items():
+            statuses[key] = statuses.get(key, 0) + count
+    return {
+        "workers": workers,
+        "scansPerSecond": round(len(samples) / elapsed, 1),
+        "seconds": round(elapsed, 3),
+        **percentiles(samples),
+        "statuses": statuses
+    }
+
+
+async def run(args) -> Dict:
+    from database import Database
+
+    runs = []
+    for workers in args.workers:
+        use_temp_database(f"workers{workers}")
+        db = Database(os.environ["DB_PATH"])
+        qr_codes = seed_members(db, args.members)
+        for n in range(2, args.gateways + 1):
+            db.register_gateway(f"GATEWAY-{n:03d}", f"Gateway {n}")
+        db.close()
+        runs.append(await measure(workers, args, qr_codes))
+
+    base = runs[0]['scansPerSecond'] / runs[0]['workers']
+    for result in runs:
+        result['speedup'] = round(result['scansPerSecond'] / runs[0]['scansPerSecond'], 2)
+        result['efficiency'] = round(result['scansPerSecond'] / (base * result['workers']), 2)
+
+    return {
+        "config": {
+            "members": args.members,
+            "gateways": args.gateways,
+            "scansPerGateway": args.scans,
+            "clientProcesses": args.client_processes,
+            "connectionsPerProcess": args.connections,
+            "storageProfile": os.environ.get("STORAGE_PROFILE", "balanced"),
+            "cpus": os.cpu_count()
+        },
+        "runs": runs
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4",
+                        type=lambda value: [int(n) for n in value.split(",")],
+                        help="comma separated worker counts")
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--gateways", type=int, default=32, help="concurrently scanning gateways")
+    parser.add_argument("--scans", type=int, default=500, help="scans per gateway")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--connections", type=int, default=16, help="HTTP connections per client process")
+    parser.add_argument("--storage-profile", choices=["durable", "balanced", "throughput"])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    args = parser.parse_args()
+    if args.gateways * args.scans > args.members:
+        parser.error("--members must be at least --gateways x --scans")
+    if args.storage_profile:
+        os.environ["STORAGE_PROFILE"] = args.storage_profile
+
+    result = asyncio.run(run(args))
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as fileobj:
+            fileobj.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+"""
+Shared helpers for the backend benchmarks
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+DESIGNATIONS = ["Member", "Booth Agent", "Ward Secretary", "District Secretary", "MLA", "MP"]
+CONSTITUENCIES = [f"Constituency {n}" for n in range(1, 235)]
+
+
+def use_temp_database(prefix: str = "bench") -> str:
+    """Point the app at a fresh database and upload dir; call before importing main"""
+    work_dir = tempfile.mkdtemp(prefix=f"qr_{prefix}_")
+    os.environ["DB_PATH"] = os.path.join(work_dir, "party_members.db")
+    os.environ["UPLOAD_DIR"] = os.path.join(work_dir, "uploads")
+    return work_dir
+
+
+def synthetic_members(count: int, seed: int = 42, start: int = 0) -> List[tuple]:
+    """Generate (qr_code_id, name, designation, constituency,
+    constituency_number, mobile_number) tuples for add_members_bulk"""
+    rng = random.Random(seed)
+    members = []
+    for n in range(start, start + count):
+        constituency_number = rng.randrange(len(CONSTITUENCIES))
+        members.append((
+            f"QR{n:08d}",
+            f"Member {n}",
+            rng.choice(DESIGNATIONS),
+            CONSTITUENCIES[constituency_number],
+            str(constituency_number + 1),
+            f"9{rng.randrange(10**9):09d}"
+        ))
+    return members
+
+
+def seed_members(db, count: int, gateway_id: str = "GATEWAY-001",
+                 chunk_size: int = 50000) -> List[str]:
+    """Insert a synthetic roster and return its QR code IDs"""
+    members = synthetic_members(count)
+    for start in range(0, count, chunk_size):
+        db.add_members_bulk(members[start:start + chunk_size], gateway_id=gateway_id)
+    return [member[0] for member in members]
+
+
+def seed_scan_history(db, qr_codes: List[str], days: int, scanned_fraction: float = 0.3,
+                      gateways: int = 10, seed: int = 42) -> int:
+    """Insert valid scans for the `days` days before today and rebuild the
+    scan aggregates; returns the number of scans inserted"""
+    rng = random.Random(seed)
+    per_day = int(len(qr_codes) * scanned_fraction)
+    total = 0
+    today = date.today()
+    for offset in range(days, 0, -1):
+        scan_date = today - timedelta(days=offset)
+        day_start = datetime.combine(scan_date, datetime.min.time()) + timedelta(hours=8)
+        # Member ids follow roster order for a freshly seeded database
+        members = rng.sample(range(len(qr_codes)), per_day)
+        rows = (
+            (qr_codes[n], n + 1, f"GATEWAY-{rng.randrange(gateways) + 1:03d}",
+             (day_start + timedelta(seconds=rng.randrange(10 * 3600))).strftime("%Y-%m-%d %H:%M:%S"),
+             scan_date.isoformat())
+            for n in members
+        )
+        with db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO scan_history (qr_code_id, member_id, gateway_id, scanned_at,
+                                          scan_date, is_valid, validation_message)
+                VALUES (?, ?, ?, ?, ?, 1, 'Valid scan')
+            """, rows)
+            conn.commit()
+        total += per_day
+    db.rebuild_scan_aggregates()
+    return total
+
+
+def members_csv(count: int, start: int) -> bytes:
+    """An upload file with `count` synthetic members numbered from `start`"""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(["Name", "Designation", "Constituency", "Constituency Number",
+                     "Mobile Number", "QR Code ID"])
+    for qr_code_id, name, designation, constituency, number, mobile in synthetic_members(count, start=start):
+        writer.writerow([name, designation, constituency, number, mobile, qr_code_id])
+    return text.getvalue().encode()
+
+
+def percentiles(samples: List[float]) -> Dict:
+    """Summarize latency samples (seconds) as milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50Ms": pick(0.50),
+        "p95Ms": pick(0.95),
+        "p99Ms": pick(0.99),
+        "maxMs": round(ordered[-1] * 1000, 3),
+        "meanMs": round(sum(ordered) / len(ordered) * 1000, 3)
+    }
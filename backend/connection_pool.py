@@ -0,0 +1,176 @@
+"""
+Connection pool for the SQLite database
+Keeps a bounded set of long-lived connections open for the life of the process
+"""
+
+import sqlite3
+import threading
+import time
+import queue
+from typing import Callable, Dict, List, Optional, Type
+
+# Sentinel pushed onto the idle queue when the pool shuts down
+_SHUTDOWN = object()
+
+
+class PoolClosedError(Exception):
+    """Raised when a connection is requested from a closed pool"""
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 30.0,
+                 cached_statements: int = 256,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 factory: Type[sqlite3.Connection] = sqlite3.Connection):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect
+        self.factory = factory
+
+        self._idle = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._generation = 0
+        self._conn_generation: Dict[int, int] = {}
+
+        # Pool metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._in_use = 0
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new connection shared across worker threads"""
+        # cached_statements keeps prepared statements alive per connection,
+        # so repeated queries skip the SQL compile step
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=self.factory
+        )
+        conn.row_factory = sqlite3.Row
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening a new one while below max_size"""
+        if self._closed:
+            raise PoolClosedError("Connection pool is closed")
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                if len(self._all) < self.max_size:
+                    conn = self._create_connection()
+                    self._all.append(conn)
+                    self._conn_generation[id(conn)] = self._generation
+
+        if conn is None:
+            # Pool exhausted - wait for a connection to be released
+            started = time.perf_counter()
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(
+                    f"Timed out after {self.timeout}s waiting for a database connection"
+                )
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._waits += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+
+        if conn is _SHUTDOWN:
+            # Leave the sentinel for any other waiting thread
+            self._idle.put(_SHUTDOWN)
+            raise PoolClosedError("Connection pool is closed")
+
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any open transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            self._in_use -= 1
+
+        if self._closed or self._conn_generation.get(id(conn)) != self._generation:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn: sqlite3.Connection):
+        """Close a connection and drop it from the pool"""
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+            self._conn_generation.pop(id(conn), None)
+        conn.close()
+
+    def recycle(self):
+        """Replace every connection so new connection settings take effect.
+        Idle connections close now, checked-out ones when released."""
+        with self._lock:
+            self._generation += 1
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is _SHUTDOWN:
+                self._idle.put(conn)
+                break
+            self._discard(conn)
+
+    def close(self):
+        """Close idle connections now and checked-out ones as they are released"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not _SHUTDOWN:
+                self._discard(conn)
+
+        # Wake any thread still waiting for a connection
+        self._idle.put(_SHUTDOWN)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get_metrics(self) -> Dict:
+        """Get pool usage metrics"""
+        with self._lock:
+            return {
+                "size": len(self._all),
+                "generation": self._generation,
+                "maxSize": self.max_size,
+                "inUse": self._in_use,
+                "idle": len(self._all) - self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "waitTimeTotalMs": round(self._wait_time_total * 1000, 3),
+                "waitTimeMaxMs": round(self._wait_time_max * 1000, 3)
+            }
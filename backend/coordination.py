@@ -0,0 +1,273 @@
+"""
+Coordination between uvicorn/gunicorn worker processes sharing one database
+Each worker keeps its own member cache, scan ledger and live event stream.
+Writers append a signal to worker_signals in the same transaction as the
+change (members added, a valid scan, a config change); every worker polls
+the table and applies other workers' signals to its own state. The workers
+table holds a heartbeat per process, used to prune signals every live worker
+has seen and to tell interrupted upload batches from running ones.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writers fall back to SQLite's busy timeout
+    fcntl = None
+
+# How often workers read new signals
+DEFAULT_POLL_INTERVAL = 0.25
+HEARTBEAT_INTERVAL = 5.0
+# Workers without a heartbeat for this long are treated as gone
+WORKER_TIMEOUT = 15.0
+
+
+def new_worker_id() -> str:
+    return f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def init_coordination(cursor: sqlite3.Cursor):
+    """Create the coordination tables inside init_database"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS workers (
+            worker_id TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            heartbeat_at REAL NOT NULL,
+            last_signal_id INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS worker_signals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            origin TEXT NOT NULL
+        )
+    """)
+    # Upload batches belong to the worker running their import
+    cursor.execute("PRAGMA table_info(upload_batches)")
+    if 'worker_id' not in {row['name'] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE upload_batches ADD COLUMN worker_id TEXT")
+
+
+def write_signal(cursor: sqlite3.Cursor, origin: str, kind: str, payload: Dict):
+    """Append a signal inside the caller's transaction"""
+    cursor.execute("""
+        INSERT INTO worker_signals (kind, payload, origin) VALUES (?, ?, ?)
+    """, (kind, json.dumps(payload), origin))
+
+
+class WriteLock:
+    """Serializes write transactions. Threads queue on a lock and, when
+    is_shared() says other workers use the database, processes queue on an
+    flock of lock_path. Blocked writers are woken as soon as the lock is
+    free instead of sleeping in SQLite's busy handler. on_wait, if given, is
+    called with the seconds each acquisition waited."""
+
+    def __init__(self, lock_path: str, is_shared: Callable[[], bool],
+                 on_wait: Optional[Callable[[float], None]] = None):
+        self.lock_path = lock_path
+        self.is_shared = is_shared
+        self.on_wait = on_wait
+        self._lock = threading.Lock()
+        self._fileobj = None
+        self._flocked = False
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self._lock.acquire()
+        try:
+            if fcntl and self.is_shared():
+                if self._fileobj is None:
+                    self._fileobj = open(self.lock_path, "a+")
+                fcntl.flock(self._fileobj, fcntl.LOCK_EX)
+                self._flocked = True
+        except Exception:
+            self._lock.release()
+            raise
+        if self.on_wait:
+            self.on_wait(time.perf_counter() - started)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self._flocked:
+                fcntl.flock(self._fileobj, fcntl.LOCK_UN)
+                self._flocked = False
+        finally:
+            self._lock.release()
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this id is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WorkerCoordinator:
+    def __init__(self, db, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.db = db
+        self.worker_id = db.worker_id
+        self.poll_interval = poll_interval
+        self.last_signal_id = 0
+        self._handlers: Dict[str, Callable[[Dict], None]] = {
+            "members": self._apply_members,
+            "scan": self._apply_scan,
+            "invalidate": self._apply_invalidate,
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_heartbeat = 0.0
+
+        self.applied = 0
+        self.reloads = 0
+        self.live_workers = 1
+
+    def on(self, kind: str, handler: Callable[[Dict], None]):
+        """Handle signals of `kind` sent by other workers"""
+        self._handlers[kind] = handler
+
+    def register(self):
+        """Announce this worker; call before loading caches so no signal
+        written after the load is missed"""
+        with self.db.get_connection() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM worker_signals").fetchone()
+            self.last_signal_id = row[0]
+        self.heartbeat()
+
+    def start(self):
+        """Start polling for signals in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="worker-coordinator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and remove this worker's heartbeat"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            with self.db.get_connection() as conn:
+                conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+                conn.commit()
+        except Exception as e:
+            print(f"Error unregistering worker: {e}")
+
+    def broadcast(self, kind: str, payload: Dict):
+        """Send a signal to the other workers in its own transaction"""
+        if not self.db.multi_worker:
+            return
+        with self.db.get_connection() as conn, self.db.write_lock:
+            write_signal(conn.cursor(), self.worker_id, kind, payload)
+            conn.commit()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+                if time.monotonic() - self._last_heartbeat >= HEARTBEAT_INTERVAL:
+                    self.heartbeat()
+            except Exception as e:
+                print(f"Error polling worker signals: {e}")
+
+    def poll(self) -> int:
+        """Apply signals written by other workers since the last poll"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT id, kind, payload, origin FROM worker_signals
+                WHERE id > ? ORDER BY id
+            """, (self.last_signal_id,)).fetchall()
+
+        applied = 0
+        for row in rows:
+            self.last_signal_id = row['id']
+            if row['origin'] == self.worker_id:
+                continue
+            handler = self._handlers.get(row['kind'])
+            if handler:
+                handler(json.loads(row['payload']))
+                applied += 1
+        self.applied += applied
+        return applied
+
+    def heartbeat(self):
+        """Refresh this worker's heartbeat and prune signals every live worker has read"""
+        now = time.time()
+        with self.db.get_connection() as conn, self.db.write_lock:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                INSERT OR REPLACE INTO workers (worker_id, pid, heartbeat_at, last_signal_id)
+                VALUES (?, ?, ?, ?)
+            """, (self.worker_id, os.getpid(), now, self.last_signal_id))
+            cursor.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - 4 * WORKER_TIMEOUT,))
+            cursor.execute("""
+                SELECT COUNT(*), MIN(last_signal_id) FROM workers WHERE heartbeat_at >= ?
+            """, (now - WORKER_TIMEOUT,))
+            live, oldest_read = cursor.fetchone()
+            cursor.execute("DELETE FROM worker_signals WHERE id <= ?", (oldest_read,))
+            cursor.execute("SELECT MIN(id) FROM worker_signals")
+            first_id = cursor.fetchone()[0]
+            conn.commit()
+        self._last_heartbeat = time.monotonic()
+        self.live_workers = live
+
+        if live > 1 and not self.db.multi_worker:
+            # Started with uvicorn --workers instead of WEB_CONCURRENCY
+            print("Other workers share this database; enabling multi-worker mode "
+                  "(set WEB_CONCURRENCY to the worker count)")
+            self.db.multi_worker = True
+        if first_id is not None and first_id > self.last_signal_id + 1:
+            # Stalled long enough for other workers to prune signals it had not read
+            self.last_signal_id = first_id - 1
+            self._apply_invalidate({})
+
+    def get_live_workers(self) -> List[str]:
+        """Ids of workers with a recent heartbeat whose process is running"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT worker_id, pid FROM workers WHERE heartbeat_at >= ?
+            """, (time.time() - WORKER_TIMEOUT,)).fetchall()
+        return [row['worker_id'] for row in rows if pid_alive(row['pid'])]
+
+    def _apply_members(self, payload: Dict):
+        self.db.cache_members(payload['firstId'], payload['lastId'])
+        self.db.events.publish("members", {"gatewayId": payload['gatewayId'], "added": payload['added']})
+
+    def _apply_scan(self, event: Dict):
+        self.db.scan_ledger.record(date.fromisoformat(event['scanDate']), event['memberId'],
+                                   event['gatewayId'], event['scannedAt'])
+        self.db.events.publish("scan", event)
+
+    def _apply_invalidate(self, payload: Dict):
+        self.db.warm_member_cache()
+        self.db.load_scan_ledger()
+        self.reloads += 1
+
+    def get_status(self) -> Dict:
+        """Get coordination state"""
+        return {
+            "workerId": self.worker_id,
+            "multiWorker": self.db.multi_worker,
+            "liveWorkers": self.live_workers,
+            "lastSignalId": self.last_signal_id,
+            "signalsApplied": self.applied,
+            "reloads": self.reloads
+        }
@@ -5,210 +5,526 @@ Handles SQLite database operations for offline local system
 
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Set, Tuple
 import json
+import uuid
+import base64
+import zlib
+
+from connection_pool import ConnectionPool
+from coordination import WriteLock, init_coordination, new_worker_id, write_signal
+from events import EventBroadcaster
+from indexes import ensure_indexes, indexes_checksum
+from member_cache import MemberCache, MemberRecord
+from metrics import InstrumentedConnection, QueryMetrics
+from scan_ledger import ScanLedger
+from storage_profile import STORAGE_PROFILES, DEFAULT_STORAGE_PROFILE, apply_storage_profile
+
+# Sortable member columns for paginated listings; each is NOT NULL so it
+# works in keyset comparisons
+MEMBER_SORT_COLUMNS = {
+    "created_at": "m.created_at",
+    "upload_date": "m.upload_date",
+    "name": "m.name",
+    "qr_code_id": "m.qr_code_id"
+}
+
+
+# Closed days of scan_history are moved into monthly tables named with this
+# prefix (see archive.py); the scan_history_all view reads across all of them
+SCAN_ARCHIVE_PREFIX = "scan_history_archive_"
+
+# Replayed scans up to this many seconds ahead of the server clock come from
+# a gateway whose clock runs fast; they are recorded at the time received
+DEFAULT_SCAN_CLOCK_SKEW = 300
+
+# Bump when init_database or init_coordination changes the schema. A database
+# whose user_version holds the current schema_stamp() skips the DDL at startup
+SCHEMA_VERSION = 1
+
+# Per-member scan aggregates computed from all scan history, in
+# member_scan_stats column order
+SCAN_AGGREGATES_SQL = """
+    WITH valid AS (
+        SELECT member_id, gateway_id, scanned_at, scan_date
+        FROM scan_history_all WHERE is_valid = 1
+    ),
+    totals AS (
+        SELECT member_id, COUNT(*) as scan_count,
+               MAX(scanned_at) as last_scanned_at, MAX(scan_date) as last_scan_date
+        FROM valid GROUP BY member_id
+    )
+    SELECT t.member_id, t.scan_count, t.last_scanned_at,
+           (SELECT v.gateway_id FROM valid v
+            WHERE v.member_id = t.member_id AND v.scanned_at = t.last_scanned_at
+            ORDER BY v.gateway_id DESC LIMIT 1) as last_gateway_id,
+           t.last_scan_date,
+           (SELECT MIN(v.scanned_at) FROM valid v
+            WHERE v.member_id = t.member_id AND v.scan_date = t.last_scan_date) as day_first_scanned_at
+    FROM totals t
+"""
+
+
+def schema_stamp() -> int:
+    """SCHEMA_VERSION and the declared indexes as a PRAGMA user_version value"""
+    return zlib.crc32(f"{SCHEMA_VERSION}:{indexes_checksum()}".encode()) & 0x7FFFFFFF
+
+
+def _encode_cursor(value, member_id: int) -> str:
+    """Encode the last row's sort key as an opaque page cursor"""
+    return base64.urlsafe_b64encode(json.dumps([value, member_id]).encode()).decode()
+
+
+def _decode_cursor(token: str) -> Tuple:
+    try:
+        value, member_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return value, int(member_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
 
 class Database:
-    def __init__(self, db_path: str = "party_members.db"):
+    def __init__(self, db_path: str = "party_members.db", pool_size: int = 8,
+                 storage_profile: str = DEFAULT_STORAGE_PROFILE,
+                 member_cache_size: int = 0, query_metrics: QueryMetrics = None,
+                 multi_worker: bool = False):
         self.db_path = db_path
+        self.storage_profile = storage_profile
+        self.member_cache = MemberCache(max_entries=member_cache_size)
+        self.scan_ledger = ScanLedger()
+        self.events = EventBroadcaster()
+        self.query_metrics = query_metrics
+        self.scan_clock_skew = DEFAULT_SCAN_CLOCK_SKEW
+        # With several worker processes, other workers' changes reach the
+        # caches late, so cache and ledger misses are checked in the database
+        # and changes are signalled to the other workers (see coordination.py)
+        self.multi_worker = multi_worker
+        self.worker_id = new_worker_id()
+        self.write_lock = WriteLock(db_path + "-writer.lock", lambda: self.multi_worker,
+                                    on_wait=query_metrics.observe_write_lock if query_metrics else None)
+        self.pool = ConnectionPool(db_path, max_size=pool_size,
+                                   on_connect=self._configure_connection,
+                                   factory=InstrumentedConnection if query_metrics else sqlite3.Connection)
         self.init_database()
+        
+        # A profile saved in system_config overrides the startup default
+        stored_profile = self.get_system_config('storage_profile')
+        if stored_profile in STORAGE_PROFILES and stored_profile != self.storage_profile:
+            self.storage_profile = stored_profile
+            self.pool.recycle()
+    
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """Apply the active storage profile to a newly opened connection"""
+        if self.query_metrics:
+            conn.query_metrics = self.query_metrics
+            self.query_metrics.connections_opened.inc()
+        apply_storage_profile(conn, self.storage_profile)
     
+    @contextmanager
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Check out a pooled database connection for the duration of the block"""
+        conn = self.pool.acquire()
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
     
-    def init_database(self):
-        """Initialize database with required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # System configuration table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS system_config (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                config_key TEXT UNIQUE NOT NULL,
-                config_value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    def close(self):
+        """Close all pooled connections (called on application shutdown)"""
+        self.pool.close()
+    
+    def get_pool_metrics(self) -> Dict:
+        """Get connection pool metrics"""
+        return self.pool.get_metrics()
+    
+    def set_storage_profile(self, profile_name: str):
+        """Switch storage profile and reopen pooled connections with it"""
+        if profile_name not in STORAGE_PROFILES:
+            raise ValueError(
+                f"Unknown storage profile '{profile_name}'. "
+                f"Available: {', '.join(STORAGE_PROFILES)}"
             )
-        """)
+        self.set_system_config('storage_profile', profile_name)
+        self.storage_profile = profile_name
+        self.pool.recycle()
+    
+    def get_storage_status(self) -> Dict:
+        """Get the active storage profile and the journal mode in effect"""
+        with self.get_connection() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
         
-        # Gateway configuration table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS gateways (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                gateway_id TEXT UNIQUE NOT NULL,
-                gateway_name TEXT NOT NULL,
-                location TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                last_sync_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        return {
+            "profile": self.storage_profile,
+            "settings": STORAGE_PROFILES[self.storage_profile],
+            "journalMode": journal_mode,
+            "synchronous": synchronous
+        }
+    
+    def init_database(self, force: bool = False) -> bool:
+        """
+        Initialize database with required tables
+        Skipped, without taking the write lock, when the database is already
+        stamped with the current schema unless force is set
+        Returns: whether the schema was checked
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            stamp = schema_stamp()
+            if not force and cursor.execute("PRAGMA user_version").fetchone()[0] == stamp:
+                return False
+            
+            # Workers starting together take turns creating the schema
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # System configuration table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS system_config (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    config_key TEXT UNIQUE NOT NULL,
+                    config_value TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Gateway configuration table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS gateways (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    gateway_id TEXT UNIQUE NOT NULL,
+                    gateway_name TEXT NOT NULL,
+                    location TEXT,
+                    is_active BOOLEAN DEFAULT 1,
+                    last_sync_at TIMESTAMP,
+                    sync_cursor INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Members table with upload tracking
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS members (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    qr_code_id TEXT UNIQUE NOT NULL,
+                    name TEXT NOT NULL,
+                    designation TEXT,
+                    constituency TEXT,
+                    constituency_number TEXT,
+                    mobile_number TEXT,
+                    upload_date TIMESTAMP NOT NULL,
+                    upload_batch_id TEXT,
+                    gateway_id TEXT,
+                    is_active BOOLEAN DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    change_seq INTEGER,
+                    FOREIGN KEY (gateway_id) REFERENCES gateways(gateway_id)
+                )
+            """)
+            
+            # Scan history table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS scan_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    qr_code_id TEXT NOT NULL,
+                    member_id INTEGER NOT NULL,
+                    gateway_id TEXT NOT NULL,
+                    scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    scan_date DATE NOT NULL,
+                    is_valid BOOLEAN DEFAULT 1,
+                    validation_message TEXT,
+                    scan_uid TEXT,
+                    FOREIGN KEY (member_id) REFERENCES members(id),
+                    FOREIGN KEY (gateway_id) REFERENCES gateways(gateway_id)
+                )
+            """)
+            
+            # Upload batches table for tracking data uploads
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS upload_batches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    batch_id TEXT UNIQUE NOT NULL,
+                    gateway_id TEXT NOT NULL,
+                    file_name TEXT,
+                    total_records INTEGER DEFAULT 0,
+                    successful_records INTEGER DEFAULT 0,
+                    failed_records INTEGER DEFAULT 0,
+                    upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    uploaded_by TEXT,
+                    status TEXT DEFAULT 'completed',
+                    FOREIGN KEY (gateway_id) REFERENCES gateways(gateway_id)
+                )
+            """)
+            
+            # Version tracking for upgrades
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS version_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    version TEXT NOT NULL,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    migration_script TEXT
+                )
+            """)
+            
+            # Scans acknowledged before they commit carry a unique id so a
+            # replayed scan journal never records them twice (see scan_writer.py)
+            cursor.execute("PRAGMA table_info(scan_history)")
+            if 'scan_uid' not in {row['name'] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE scan_history ADD COLUMN scan_uid TEXT")
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_scan_history_scan_uid
+                ON scan_history(scan_uid) WHERE scan_uid IS NOT NULL
+            """)
+            
+            self._refresh_scan_history_view(cursor)
+            
+            # Per-member scan aggregates, maintained by every valid scan so
+            # listings do not have to aggregate scan_history
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM sqlite_master
+                WHERE type = 'table' AND name = 'member_scan_stats'
+            """)
+            backfill_aggregates = cursor.fetchone()['count'] == 0
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS member_scan_stats (
+                    member_id INTEGER PRIMARY KEY,
+                    scan_count INTEGER NOT NULL DEFAULT 0,
+                    last_scanned_at TIMESTAMP,
+                    last_gateway_id TEXT,
+                    last_scan_date DATE,
+                    day_first_scanned_at TIMESTAMP,
+                    FOREIGN KEY (member_id) REFERENCES members(id)
+                )
+            """)
+            if backfill_aggregates:
+                self._rebuild_scan_aggregates(cursor)
+            
+            self._init_member_sync(cursor)
+            init_coordination(cursor)
+            
+            # Indexes for the hot queries (see indexes.py)
+            ensure_indexes(cursor)
+            
+            # Insert default system version
+            cursor.execute("""
+                INSERT OR IGNORE INTO system_config (config_key, config_value)
+                VALUES ('system_version', '1.0.0')
+            """)
+            cursor.execute("""
+                INSERT OR IGNORE INTO system_config (config_key, config_value)
+                VALUES ('data_version', '0')
+            """)
+            
+            # Insert default gateway if none exists
+            cursor.execute("SELECT COUNT(*) as count FROM gateways")
+            if cursor.fetchone()['count'] == 0:
+                cursor.execute("""
+                    INSERT INTO gateways (gateway_id, gateway_name, location, is_active)
+                    VALUES ('GATEWAY-001', 'Main Gateway', 'Headquarters', 1)
+                """)
+            
+            # Insert initial version record
+            cursor.execute("SELECT COUNT(*) as count FROM version_history")
+            if cursor.fetchone()['count'] == 0:
+                cursor.execute("""
+                    INSERT INTO version_history (version, description)
+                    VALUES ('1.0.0', 'Initial system setup with offline local database')
+                """)
+            
+            cursor.execute(f"PRAGMA user_version = {stamp}")
+            conn.commit()
+        return True
+    
+    def _init_member_sync(self, cursor: sqlite3.Cursor):
+        """Set up change sequence numbers for delta member sync"""
+        # Databases created before delta sync lack these columns
+        cursor.execute("PRAGMA table_info(members)")
+        if 'change_seq' not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE members ADD COLUMN change_seq INTEGER")
+            cursor.execute("UPDATE members SET change_seq = id")
+        cursor.execute("PRAGMA table_info(gateways)")
+        if 'sync_cursor' not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE gateways ADD COLUMN sync_cursor INTEGER DEFAULT 0")
         
-        # Members table with upload tracking
+        # Single-row counter; inserts take values from _reserve_change_seqs
+        # (cheaper than a per-row trigger for bulk uploads) and updates from
+        # the trigger below
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS members (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                qr_code_id TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                designation TEXT,
-                constituency TEXT,
-                constituency_number TEXT,
-                mobile_number TEXT,
-                upload_date TIMESTAMP NOT NULL,
-                upload_batch_id TEXT,
-                gateway_id TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (gateway_id) REFERENCES gateways(gateway_id)
+            CREATE TABLE IF NOT EXISTS sync_sequence (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL
             )
         """)
-        
-        # Scan history table
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS scan_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                qr_code_id TEXT NOT NULL,
-                member_id INTEGER NOT NULL,
-                gateway_id TEXT NOT NULL,
-                scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                scan_date DATE NOT NULL,
-                is_valid BOOLEAN DEFAULT 1,
-                validation_message TEXT,
-                FOREIGN KEY (member_id) REFERENCES members(id),
-                FOREIGN KEY (gateway_id) REFERENCES gateways(gateway_id)
-            )
+            INSERT OR IGNORE INTO sync_sequence (id, seq)
+            SELECT 1, COALESCE(MAX(change_seq), 0) FROM members
         """)
-        
-        # Upload batches table for tracking data uploads
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS upload_batches (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                batch_id TEXT UNIQUE NOT NULL,
-                gateway_id TEXT NOT NULL,
-                file_name TEXT,
-                total_records INTEGER DEFAULT 0,
-                successful_records INTEGER DEFAULT 0,
-                failed_records INTEGER DEFAULT 0,
-                upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                uploaded_by TEXT,
-                status TEXT DEFAULT 'completed',
-                FOREIGN KEY (gateway_id) REFERENCES gateways(gateway_id)
-            )
+            CREATE TRIGGER IF NOT EXISTS trg_members_sync_update
+            AFTER UPDATE OF qr_code_id, name, designation, constituency, constituency_number,
+                            mobile_number, upload_date, gateway_id, is_active ON members
+            BEGIN
+                UPDATE sync_sequence SET seq = seq + 1 WHERE id = 1;
+                UPDATE members SET change_seq = (SELECT seq FROM sync_sequence WHERE id = 1)
+                WHERE id = NEW.id;
+            END
         """)
+    
+    def _refresh_scan_history_view(self, cursor: sqlite3.Cursor):
+        """(Re)create the scan_history_all view over scan_history and its archive tables"""
+        cursor.execute("PRAGMA table_info(scan_history)")
+        columns = [row['name'] for row in cursor.fetchall()]
+        selects = [f"SELECT {', '.join(columns)} FROM scan_history"]
         
-        # Version tracking for upgrades
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS version_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                version TEXT NOT NULL,
-                description TEXT,
-                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                migration_script TEXT
-            )
-        """)
-        
-        # Create indexes for better performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_qr_code ON members(qr_code_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_upload_date ON members(upload_date)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_date ON scan_history(scan_date)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_member ON scan_history(member_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_gateway ON scan_history(gateway_id)")
-        
-        # Insert default system version
         cursor.execute("""
-            INSERT OR IGNORE INTO system_config (config_key, config_value)
-            VALUES ('system_version', '1.0.0')
-        """)
+            SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?
+            ORDER BY name
+        """, (SCAN_ARCHIVE_PREFIX + '*',))
+        for table in [row['name'] for row in cursor.fetchall()]:
+            # Archives created before a scan_history migration lack its columns
+            cursor.execute(f"PRAGMA table_info({table})")
+            archived = {row['name'] for row in cursor.fetchall()}
+            select_list = ', '.join(c if c in archived else f"NULL AS {c}" for c in columns)
+            selects.append(f"SELECT {select_list} FROM {table}")
         
-        # Insert default gateway if none exists
-        cursor.execute("SELECT COUNT(*) as count FROM gateways")
-        if cursor.fetchone()['count'] == 0:
-            cursor.execute("""
-                INSERT INTO gateways (gateway_id, gateway_name, location, is_active)
-                VALUES ('GATEWAY-001', 'Main Gateway', 'Headquarters', 1)
-            """)
-        
-        # Insert initial version record
-        cursor.execute("SELECT COUNT(*) as count FROM version_history")
-        if cursor.fetchone()['count'] == 0:
-            cursor.execute("""
-                INSERT INTO version_history (version, description)
-                VALUES ('1.0.0', 'Initial system setup with offline local database')
-            """)
-        
-        conn.commit()
-        conn.close()
+        view_sql = "CREATE VIEW scan_history_all AS\n" + "\nUNION ALL\n".join(selects)
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'scan_history_all'")
+        current = cursor.fetchone()
+        if current and current['sql'] == view_sql:
+            return
+        cursor.execute("DROP VIEW IF EXISTS scan_history_all")
+        cursor.execute(view_sql)
+    
+    def _reserve_change_seqs(self, cursor: sqlite3.Cursor, count: int) -> int:
+        """Reserve `count` change sequence numbers; returns the one before the first"""
+        cursor.execute("SELECT seq FROM sync_sequence WHERE id = 1")
+        base = cursor.fetchone()['seq']
+        cursor.execute("UPDATE sync_sequence SET seq = ? WHERE id = 1", (base + count,))
+        return base
+    
+    def _signal(self, cursor: sqlite3.Cursor, kind: str, payload: Dict):
+        """Tell other worker processes about a change, inside the caller's transaction"""
+        if self.multi_worker:
+            write_signal(cursor, self.worker_id, kind, payload)
     
     def get_system_config(self, key: str) -> Optional[str]:
         """Get system configuration value"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT config_value FROM system_config WHERE config_key = ?", (key,))
-        result = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT config_value FROM system_config WHERE config_key = ?", (key,))
+            result = cursor.fetchone()
         return result['config_value'] if result else None
     
     def set_system_config(self, key: str, value: str):
         """Set system configuration value"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO system_config (config_key, config_value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, (key, value))
+            conn.commit()
+    
+    def _bump_data_version(self, cursor: sqlite3.Cursor):
+        """Mark member or scan data as changed, inside the caller's transaction"""
         cursor.execute("""
-            INSERT OR REPLACE INTO system_config (config_key, config_value, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        """, (key, value))
-        conn.commit()
-        conn.close()
+            UPDATE system_config
+            SET config_value = CAST(config_value AS INTEGER) + 1
+            WHERE config_key = 'data_version'
+        """)
+    
+    def get_data_version(self) -> int:
+        """Counter that changes whenever members or valid scans are added"""
+        return int(self.get_system_config('data_version') or 0)
     
     def register_gateway(self, gateway_id: str, gateway_name: str, location: str = "") -> bool:
         """Register a new gateway"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO gateways (gateway_id, gateway_name, location, is_active)
-                VALUES (?, ?, ?, 1)
-            """, (gateway_id, gateway_name, location))
-            conn.commit()
-            conn.close()
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO gateways (gateway_id, gateway_name, location, is_active)
+                    VALUES (?, ?, ?, 1)
+                """, (gateway_id, gateway_name, location))
+                conn.commit()
             return True
         except sqlite3.IntegrityError:
             return False
     
     def get_all_gateways(self) -> List[Dict]:
         """Get all registered gateways"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM gateways ORDER BY created_at DESC")
-        gateways = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM gateways ORDER BY created_at DESC")
+            gateways = [dict(row) for row in cursor.fetchall()]
         return gateways
     
     def get_active_gateways(self) -> List[Dict]:
         """Get all active gateways"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM gateways WHERE is_active = 1 ORDER BY created_at DESC")
-        gateways = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM gateways WHERE is_active = 1 ORDER BY created_at DESC")
+            gateways = [dict(row) for row in cursor.fetchall()]
         return gateways
     
     def update_gateway_sync(self, gateway_id: str):
         """Update gateway last sync timestamp"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE gateways 
-            SET last_sync_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-            WHERE gateway_id = ?
-        """, (gateway_id,))
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE gateways 
+                SET last_sync_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE gateway_id = ?
+            """, (gateway_id,))
+            conn.commit()
+    
+    def sync_member_changes(self, gateway_id: str, since: int = 0,
+                            limit: int = 1000) -> Optional[Dict]:
+        """
+        Get members added or changed after change sequence `since`, oldest first
+        Deactivated members are included with isActive false. The gateway's
+        sync cursor is set to `since`, which it has already applied.
+        Returns: None for an unknown gateway, else
+                 {"members": [...], "nextSince", "hasMore", "latest"}
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE gateways 
+                SET sync_cursor = ?, last_sync_at = CURRENT_TIMESTAMP
+                WHERE gateway_id = ?
+            """, (since, gateway_id))
+            if cursor.rowcount == 0:
+                return None
+            conn.commit()
+            
+            cursor.execute("""
+                SELECT change_seq, qr_code_id, name, designation, constituency,
+                       constituency_number, mobile_number, upload_date, gateway_id, is_active
+                FROM members
+                WHERE change_seq > ?
+                ORDER BY change_seq
+                LIMIT ?
+            """, (since, limit + 1))
+            rows = cursor.fetchall()
+            cursor.execute("SELECT seq FROM sync_sequence WHERE id = 1")
+            latest = cursor.fetchone()['seq']
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "members": [[row['change_seq'], row['qr_code_id'], row['name'], row['designation'],
+                         row['constituency'], row['constituency_number'], row['mobile_number'],
+                         row['upload_date'], row['gateway_id'], bool(row['is_active'])]
+                        for row in rows],
+            "nextSince": rows[-1]['change_seq'] if rows else since,
+            "hasMore": has_more,
+            "latest": latest
+        }
     
     def add_member(self, qr_code_id: str, name: str, designation: str = "", 
                    constituency: str = "", constituency_number: str = "",
@@ -216,41 +532,167 @@ class Database:
                    upload_batch_id: str = None) -> Tuple[bool, str]:
         """Add a new member with upload date tracking"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            upload_date = datetime.now()
+            with self.get_connection() as conn, self.write_lock:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                
+                upload_date = datetime.now()
+                change_seq = self._reserve_change_seqs(cursor, 1) + 1
+                
+                cursor.execute("""
+                    INSERT INTO members (
+                        qr_code_id, name, designation, constituency, 
+                        constituency_number, mobile_number, upload_date,
+                        upload_batch_id, gateway_id, change_seq
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (qr_code_id, name, designation, constituency, 
+                      constituency_number, mobile_number, upload_date,
+                      upload_batch_id, gateway_id, change_seq))
+                member_id = cursor.lastrowid
+                self._bump_data_version(cursor)
+                self._signal(cursor, "members", {"firstId": member_id, "lastId": member_id,
+                                                 "gatewayId": gateway_id, "added": 1})
+                
+                conn.commit()
             
-            cursor.execute("""
-                INSERT INTO members (
-                    qr_code_id, name, designation, constituency, 
-                    constituency_number, mobile_number, upload_date,
-                    upload_batch_id, gateway_id
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (qr_code_id, name, designation, constituency, 
-                  constituency_number, mobile_number, upload_date,
-                  upload_batch_id, gateway_id))
-            
-            conn.commit()
-            conn.close()
+            # Stored upload_date text matches sqlite3's datetime adapter
+            self.member_cache.put(MemberRecord(
+                member_id, qr_code_id, name, designation, constituency,
+                constituency_number, mobile_number, str(upload_date), gateway_id
+            ))
+            self.events.publish("members", {"gatewayId": gateway_id, "added": 1})
             return True, "Member added successfully"
         except sqlite3.IntegrityError:
             return False, f"Member with QR Code ID {qr_code_id} already exists"
         except Exception as e:
             return False, str(e)
     
+    def add_members_bulk(self, members: List[Tuple[str, str, str, str, str, str]],
+                         gateway_id: str = "GATEWAY-001",
+                         upload_batch_id: str = None) -> Tuple[int, Dict[str, str]]:
+        """
+        Add many members in one transaction
+        members: (qr_code_id, name, designation, constituency,
+                  constituency_number, mobile_number) tuples
+        Returns: (added_count, {qr_code_id: error_message} for rejected members)
+        """
+        upload_date = datetime.now()
+        insert_sql = """
+            INSERT INTO members (
+                qr_code_id, name, designation, constituency, 
+                constituency_number, mobile_number, upload_date,
+                upload_batch_id, gateway_id, change_seq
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        failures = {}
+        
+        def numbered_params(cursor: sqlite3.Cursor) -> List[tuple]:
+            base = self._reserve_change_seqs(cursor, len(members))
+            return [member + (upload_date, upload_batch_id, gateway_id, base + i + 1)
+                    for i, member in enumerate(members)]
+        
+        with self.get_connection() as conn, self.write_lock:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM members")
+            last_id = cursor.fetchone()[0]
+            
+            try:
+                cursor.executemany(insert_sql, numbered_params(cursor))
+            except sqlite3.IntegrityError:
+                # Some QR codes were added since the caller checked for
+                # duplicates; redo the batch row by row to find them
+                conn.rollback()
+                cursor.execute("BEGIN IMMEDIATE")
+                for row in numbered_params(cursor):
+                    try:
+                        cursor.execute(insert_sql, row)
+                    except sqlite3.IntegrityError:
+                        failures[row[0]] = f"Member with QR Code ID {row[0]} already exists"
+            
+            cursor.execute("""
+                SELECT id, qr_code_id, name, designation, constituency,
+                       constituency_number, mobile_number, upload_date, gateway_id
+                FROM members WHERE id > ?
+            """, (last_id,))
+            records = [MemberRecord.from_row(row) for row in cursor.fetchall()]
+            if records:
+                self._bump_data_version(cursor)
+                self._signal(cursor, "members", {"firstId": min(r.id for r in records),
+                                                 "lastId": max(r.id for r in records),
+                                                 "gatewayId": gateway_id, "added": len(records)})
+            
+            conn.commit()
+        
+        self.member_cache.put_many(records)
+        if records:
+            self.events.publish("members", {"gatewayId": gateway_id, "added": len(records)})
+        return len(records), failures
+    
+    def find_existing_qr_codes(self, qr_code_ids: List[str]) -> Set[str]:
+        """Return the subset of QR code IDs already present in the members table"""
+        existing = set()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(qr_code_ids), 500):
+                chunk = qr_code_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    f"SELECT qr_code_id FROM members WHERE qr_code_id IN ({placeholders})",
+                    chunk
+                )
+                existing.update(row['qr_code_id'] for row in cursor.fetchall())
+        return existing
+    
     def get_member_by_qr(self, qr_code_id: str) -> Optional[Dict]:
-        """Get member by QR code ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM members 
-            WHERE qr_code_id = ? AND is_active = 1
-        """, (qr_code_id,))
-        member = cursor.fetchone()
-        conn.close()
-        return dict(member) if member else None
+        """Get member by QR code ID, served from the member cache when possible"""
+        record = self.member_cache.get(qr_code_id)
+        if record:
+            return record.to_dict()
+        if self.member_cache.complete and not self.multi_worker:
+            # Cache holds every active member, so the QR code is unknown
+            return None
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM members 
+                WHERE qr_code_id = ? AND is_active = 1
+            """, (qr_code_id,))
+            member = cursor.fetchone()
+        
+        if not member:
+            return None
+        self.member_cache.put(MemberRecord.from_row(member))
+        return dict(member)
+    
+    def warm_member_cache(self) -> int:
+        """Load every active member into the member cache"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, qr_code_id, name, designation, constituency,
+                       constituency_number, mobile_number, upload_date, gateway_id
+                FROM members WHERE is_active = 1
+            """)
+            self.member_cache.load(MemberRecord.from_row(row) for row in cursor)
+        return len(self.member_cache)
+    
+    def cache_members(self, first_id: int, last_id: int) -> int:
+        """Add members in an id range to the member cache (added by another worker)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, qr_code_id, name, designation, constituency,
+                       constituency_number, mobile_number, upload_date, gateway_id
+                FROM members WHERE id BETWEEN ? AND ? AND is_active = 1
+            """, (first_id, last_id))
+            records = [MemberRecord.from_row(row) for row in cursor.fetchall()]
+        self.member_cache.put_many(records)
+        return len(records)
     
     def validate_scan(self, qr_code_id: str, gateway_id: str) -> Tuple[bool, str, Optional[Dict]]:
         """
@@ -262,73 +704,469 @@ class Database:
         if not member:
             return False, "Member not found in database", None
         
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            is_valid, message = self._check_scan_rules(cursor, member, gateway_id, datetime.now())
+        
+        return is_valid, message, member
+    
+    def _check_scan_rules(self, cursor: sqlite3.Cursor, member: Dict, gateway_id: str,
+                          current_time: datetime) -> Tuple[bool, str]:
+        """Apply the upload date and duplicate scan rules to a member"""
         # Check if member was uploaded before current time
         upload_date = datetime.fromisoformat(member['upload_date'])
-        current_time = datetime.now()
         
         if upload_date > current_time:
-            return False, "Invalid: Member data uploaded in future", member
+            return False, "Invalid: Member data uploaded in future"
         
         # Check for duplicate scans today (across ALL gateways)
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        today = datetime.now().date()
-        
-        cursor.execute("""
-            SELECT * FROM scan_history 
-            WHERE member_id = ? AND scan_date = ? AND is_valid = 1
-            ORDER BY scanned_at DESC LIMIT 1
-        """, (member['id'], today))
-        
-        last_scan = cursor.fetchone()
-        conn.close()
+        scan_date = current_time.date()
+        last_scan = None
+        ledger_ready = self.scan_ledger.is_ready(scan_date)
+        if ledger_ready:
+            last_scan = self.scan_ledger.get(member['id'])
+        # Other workers' scans reach the ledger late, so only a hit is final
+        if not ledger_ready or (last_scan is None and self.multi_worker):
+            # Replayed scans from closed days may need the archive tables;
+            # today's scans are always in scan_history
+            table = "scan_history" if scan_date == datetime.now().date() else "scan_history_all"
+            # MAX() picks the latest row without sorting across the view
+            cursor.execute(f"""
+                SELECT gateway_id, MAX(scanned_at) as scanned_at FROM {table} 
+                WHERE member_id = ? AND scan_date = ? AND is_valid = 1
+            """, (member['id'], scan_date))
+            row = cursor.fetchone()
+            last_scan = (row['gateway_id'], row['scanned_at']) if row['scanned_at'] else None
         
         if last_scan:
-            scanned_gateway = last_scan['gateway_id']
-            last_scan_time = datetime.fromisoformat(last_scan['scanned_at'])
+            scanned_gateway, scanned_at = last_scan
+            last_scan_time = datetime.fromisoformat(scanned_at)
             
             if scanned_gateway == gateway_id:
                 # Same gateway - show time-based message
                 time_diff = (current_time - last_scan_time).total_seconds() / 60
                 remaining = int(60 - time_diff)
-                return False, f"Already scanned at this gate. Wait {remaining} more minutes", member
+                return False, f"Already scanned at this gate. Wait {remaining} more minutes"
             else:
                 # Different gateway - blocked for the day
                 scan_time = last_scan_time.strftime("%I:%M %p")
-                return False, f"Already scanned today at {scanned_gateway} at {scan_time}", member
+                return False, f"Already scanned today at {scanned_gateway} at {scan_time}"
         
-        return True, "Valid scan", member
+        return True, "Valid scan"
     
-    def record_scan(self, qr_code_id: str, member_id: int, gateway_id: str, 
-                    is_valid: bool, validation_message: str) -> bool:
-        """Record a scan in history"""
-        try:
-            conn = self.get_connection()
+    @staticmethod
+    def _utc_timestamp() -> str:
+        """Current time in the format of SQLite's CURRENT_TIMESTAMP"""
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    
+    def _insert_scan(self, cursor: sqlite3.Cursor, qr_code_id: str, member_id: int,
+                     gateway_id: str, is_valid: bool, validation_message: str,
+                     scan_date, scanned_at: str, scan_uid: str = None):
+        """Insert a scan_history row and update the member's scan aggregates
+        inside the caller's transaction"""
+        cursor.execute("""
+            INSERT INTO scan_history (
+                qr_code_id, member_id, gateway_id, scanned_at, scan_date,
+                is_valid, validation_message, scan_uid
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (qr_code_id, member_id, gateway_id, scanned_at, scan_date, 
+              is_valid, validation_message, scan_uid))
+        
+        if not is_valid:
+            return
+        
+        self._bump_data_version(cursor)
+        
+        # Scans can arrive out of order (e.g. replayed offline scans), so
+        # only move last_* forward and reset first_* only for a newer day
+        cursor.execute("""
+            INSERT INTO member_scan_stats (
+                member_id, scan_count, last_scanned_at, last_gateway_id,
+                last_scan_date, day_first_scanned_at
+            )
+            VALUES (?, 1, ?, ?, ?, ?)
+            ON CONFLICT(member_id) DO UPDATE SET
+                scan_count = scan_count + 1,
+                last_gateway_id = CASE
+                    WHEN last_scanned_at IS NULL OR excluded.last_scanned_at >= last_scanned_at
+                    THEN excluded.last_gateway_id ELSE last_gateway_id END,
+                last_scanned_at = MAX(COALESCE(last_scanned_at, ''), excluded.last_scanned_at),
+                day_first_scanned_at = CASE
+                    WHEN last_scan_date IS NULL OR excluded.last_scan_date > last_scan_date
+                    THEN excluded.day_first_scanned_at
+                    WHEN excluded.last_scan_date = last_scan_date
+                    THEN MIN(day_first_scanned_at, excluded.day_first_scanned_at)
+                    ELSE day_first_scanned_at END,
+                last_scan_date = MAX(COALESCE(last_scan_date, ''), excluded.last_scan_date)
+        """, (member_id, scanned_at, gateway_id, scan_date, scanned_at))
+    
+    def write_scans(self, scans: List[Dict], skip_existing: bool = False) -> int:
+        """
+        Record scans already validated by the scan writer in one transaction
+        scans are dicts with uid, qrCodeId, memberId, gatewayId, valid,
+        message, scanDate and scannedAt; skip_existing drops scans whose uid
+        is already recorded (journal replay)
+        Returns: number of scans inserted
+        """
+        inserted = 0
+        with self.get_connection() as conn, self.write_lock:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for scan in scans:
+                if skip_existing:
+                    cursor.execute("SELECT 1 FROM scan_history WHERE scan_uid = ?", (scan['uid'],))
+                    if cursor.fetchone():
+                        continue
+                self._insert_scan(cursor, scan['qrCodeId'], scan['memberId'], scan['gatewayId'],
+                                  scan['valid'], scan['message'], scan['scanDate'],
+                                  scan['scannedAt'], scan['uid'])
+                inserted += 1
+            conn.commit()
+        return inserted
+    
+    def get_scan_count(self, member_id: int) -> int:
+        """Valid scans recorded for a member"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                "SELECT scan_count FROM member_scan_stats WHERE member_id = ?", (member_id,)
+            ).fetchone()
+        return row['scan_count'] if row else 0
+    
+    def _rebuild_scan_aggregates(self, cursor: sqlite3.Cursor):
+        cursor.execute("DELETE FROM member_scan_stats")
+        cursor.execute(f"""
+            INSERT INTO member_scan_stats (
+                member_id, scan_count, last_scanned_at, last_gateway_id,
+                last_scan_date, day_first_scanned_at
+            )
+            {SCAN_AGGREGATES_SQL}
+        """)
+    
+    def rebuild_scan_aggregates(self) -> int:
+        """Recompute member_scan_stats from all scan history (recovery)"""
+        with self.get_connection() as conn, self.write_lock:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            self._rebuild_scan_aggregates(cursor)
+            # Cached exports and ETags carry the scan counts being repaired
+            self._bump_data_version(cursor)
+            cursor.execute("SELECT COUNT(*) as count FROM member_scan_stats")
+            count = cursor.fetchone()['count']
+            conn.commit()
+        return count
+    
+    def verify_scan_aggregates(self) -> Dict:
+        """Compare member_scan_stats against all scan history
+        Returns: {"checked": n, "mismatched": [member_id, ...]}"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                WITH expected AS ({SCAN_AGGREGATES_SQL})
+                SELECT COALESCE(e.member_id, a.member_id) as member_id
+                FROM expected e
+                LEFT JOIN member_scan_stats a ON a.member_id = e.member_id
+                WHERE a.member_id IS NULL
+                   OR a.scan_count != e.scan_count
+                   OR a.last_scanned_at IS NOT e.last_scanned_at
+                   OR a.last_gateway_id IS NOT e.last_gateway_id
+                   OR a.last_scan_date IS NOT e.last_scan_date
+                   OR a.day_first_scanned_at IS NOT e.day_first_scanned_at
+                UNION
+                SELECT a.member_id FROM member_scan_stats a
+                WHERE a.member_id NOT IN (SELECT member_id FROM expected)
+            """)
+            mismatched = [row['member_id'] for row in cursor.fetchall()]
+            cursor.execute("SELECT COUNT(*) as count FROM member_scan_stats")
+            checked = cursor.fetchone()['count']
+        
+        return {
+            "checked": checked,
+            "mismatched": mismatched
+        }
+    
+    def load_scan_ledger(self) -> int:
+        """Rebuild the scan ledger from today's valid scans"""
+        today = datetime.now().date()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # SQLite returns the gateway_id of the row holding MAX(scanned_at)
+            cursor.execute("""
+                SELECT member_id, gateway_id, MAX(scanned_at) as scanned_at
+                FROM scan_history 
+                WHERE scan_date = ? AND is_valid = 1
+                GROUP BY member_id
+            """, (today,))
+            self.scan_ledger.rebuild(today, (tuple(row) for row in cursor))
+        return len(self.scan_ledger)
+    
+    def get_snapshot_source(self, scan_date) -> Tuple[int, List[sqlite3.Row]]:
+        """
+        Read active members with their valid scan on scan_date, if any, for a
+        validation snapshot; both reads come from one consistent transaction
+        Returns: (data_version, rows)
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT config_value FROM system_config WHERE config_key = 'data_version'")
+            row = cursor.fetchone()
+            data_version = int(row['config_value']) if row else 0
+            cursor.execute("""
+                SELECT m.id, m.qr_code_id, m.name, m.designation, m.constituency,
+                       m.constituency_number, m.mobile_number, m.upload_date, m.gateway_id,
+                       s.gateway_id as scan_gateway_id, s.scanned_at
+                FROM members m
+                LEFT JOIN (
+                    SELECT member_id, gateway_id, MAX(scanned_at) as scanned_at
+                    FROM scan_history 
+                    WHERE scan_date = ? AND is_valid = 1
+                    GROUP BY member_id
+                ) s ON s.member_id = m.id
+                WHERE m.is_active = 1
+            """, (scan_date,))
+            rows = cursor.fetchall()
+            conn.commit()
+        return data_version, rows
+    
+    def process_scan(self, qr_code_id: str, gateway_id: str) -> Tuple[bool, str, Optional[Dict], int]:
+        """
+        Validate and record a scan in a single transaction on one connection
+        Returns: (is_valid, message, member_data, gateway_scanned_today)
+        """
+        member = self.get_member_by_qr(qr_code_id)
+        
+        if not member:
+            return False, "Member not found in database", None, 0
+        
+        with self.get_connection() as conn, self.write_lock:
             cursor = conn.cursor()
             
-            scan_date = datetime.now().date()
+            # Take the write lock before the duplicate check so two gateways
+            # scanning the same member cannot both see it as unscanned
+            cursor.execute("BEGIN IMMEDIATE")
             
-            cursor.execute("""
-                INSERT INTO scan_history (
-                    qr_code_id, member_id, gateway_id, scan_date,
-                    is_valid, validation_message
-                )
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (qr_code_id, member_id, gateway_id, scan_date, 
-                  is_valid, validation_message))
+            current_time = datetime.now()
+            today = current_time.date()
             
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error recording scan: {e}")
-            return False
+            # Scans queued by the scan writer are only in the ledger so far
+            with self.scan_ledger.check_lock:
+                is_valid, message = self._check_scan_rules(cursor, member, gateway_id, current_time)
+                
+                # Record scan (both valid and invalid)
+                scanned_at = self._utc_timestamp()
+                self._insert_scan(cursor, qr_code_id, member['id'], gateway_id,
+                                  is_valid, message, today, scanned_at)
+                
+                scanned_today = 0
+                if is_valid:
+                    # Update the ledger while the locks are still held so the
+                    # next scan of this member sees it
+                    self.scan_ledger.record(today, member['id'], gateway_id, scanned_at)
+                    scanned_today = self._gateway_scanned_today(cursor, gateway_id, today)
+                    
+                    cursor.execute("""
+                        SELECT scan_count FROM member_scan_stats WHERE member_id = ?
+                    """, (member['id'],))
+                    member['scan_count'] = cursor.fetchone()['scan_count']
+                    event = self._scan_event(member, gateway_id, scanned_at, today, scanned_today)
+                    self._signal(cursor, "scan", event)
+            
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                if is_valid:
+                    self.scan_ledger.forget(member['id'])
+                raise
+        
+        if is_valid:
+            self.events.publish("scan", event)
+        
+        return is_valid, message, member, scanned_today
+    
+    def _gateway_scanned_today(self, cursor: sqlite3.Cursor, gateway_id: str, today) -> int:
+        """Members with a valid scan today at a gateway
+        Read from the scan ledger when it holds every scan of the day; other
+        workers' scans reach it late, so multi-worker mode counts in SQL"""
+        if not self.multi_worker and self.scan_ledger.is_ready(today):
+            return self.scan_ledger.gateway_count(gateway_id)
+        cursor.execute("""
+            SELECT COUNT(DISTINCT member_id) as count 
+            FROM scan_history 
+            WHERE scan_date = ? AND gateway_id = ? AND is_valid = 1
+        """, (today, gateway_id))
+        return cursor.fetchone()['count']
+    
+    def _scan_event(self, member: Dict, gateway_id: str, scanned_at: str,
+                    scan_date, gateway_scanned_today: int) -> Dict:
+        """Live dashboard event for a valid scan, published once it commits"""
+        return {
+            "memberId": member['id'],
+            "qrCodeId": member['qr_code_id'],
+            "name": member['name'],
+            "designation": member['designation'],
+            "constituency": member['constituency'],
+            "memberGatewayId": member['gateway_id'],
+            "gatewayId": gateway_id,
+            "scannedAt": scanned_at,
+            "scanDate": str(scan_date),
+            "scanCount": member['scan_count'],
+            "gatewayScannedToday": gateway_scanned_today
+        }
+    
+    def process_scan_batch(self, gateway_id: str, scans: List[Tuple[str, datetime]],
+                           pending_uploads: int = 0) -> Dict:
+        """
+        Validate and record scans queued by an offline gateway in one transaction
+        scans are (qr_code_id, local scan time) pairs; they are checked against
+        the duplicate rules in scan time order. Times up to scan_clock_skew
+        seconds ahead of now are recorded as now
+        Returns: {"results": [...] in request order, "accepted", "rejected", "gatewayScannedToday"}
+        """
+        now = datetime.now()
+        today = now.date()
+        results: List[Optional[Dict]] = [None] * len(scans)
+        published = []
+        recorded_today = []
+        
+        # Resolve members before taking the write lock
+        members = {qr_code_id: self.get_member_by_qr(qr_code_id)
+                   for qr_code_id in {qr_code_id for qr_code_id, _ in scans}}
+        
+        with self.get_connection() as conn, self.write_lock:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            with self.scan_ledger.check_lock:
+                order = sorted(range(len(scans)), key=lambda i: scans[i][1])
+                for i in order:
+                    qr_code_id, scan_time = scans[i]
+                    result = {"index": i, "qrId": qr_code_id, "scannedAt": scan_time.isoformat()}
+                    results[i] = result
+                    
+                    if not members[qr_code_id]:
+                        result.update(status="not_found", message="Member not found in database")
+                        continue
+                    member = dict(members[qr_code_id])
+                    
+                    # Scans from after the request was received would also move
+                    # the scan ledger into a day that has not started. Within
+                    # the skew allowance the gateway clock is taken to be fast;
+                    # beyond it the scan is recorded as invalid, like /api/scan
+                    if scan_time > now:
+                        if scan_time - now > timedelta(seconds=self.scan_clock_skew):
+                            message = "Invalid: Scan time is in the future"
+                            self._insert_scan(cursor, qr_code_id, member['id'], gateway_id,
+                                              False, message, today, self._utc_timestamp())
+                            result.update(status="rejected", message=message)
+                            continue
+                        scan_time = now
+                    
+                    is_valid, message = self._check_scan_rules(cursor, member, gateway_id, scan_time)
+                    scan_date = scan_time.date()
+                    scanned_at = scan_time.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                    self._insert_scan(cursor, qr_code_id, member['id'], gateway_id,
+                                      is_valid, message, scan_date, scanned_at)
+                    result.update(status="valid" if is_valid else "rejected", message=message)
+                    
+                    if is_valid:
+                        cursor.execute("""
+                            SELECT scan_count FROM member_scan_stats WHERE member_id = ?
+                        """, (member['id'],))
+                        member['scan_count'] = cursor.fetchone()['scan_count']
+                        published.append((member, scanned_at, scan_date))
+                        # Later scans in this batch check the ledger for today
+                        if scan_date == today:
+                            self.scan_ledger.record(today, member['id'], gateway_id, scanned_at)
+                            recorded_today.append(member['id'])
+            
+            scanned_today = self._gateway_scanned_today(cursor, gateway_id, today)
+            events = [self._scan_event(member, gateway_id, scanned_at, scan_date, scanned_today)
+                      for member, scanned_at, scan_date in published]
+            for event in events:
+                self._signal(cursor, "scan", event)
+            
+            self._mark_gateway_synced(cursor, gateway_id, pending_uploads)
+            
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                for member_id in recorded_today:
+                    self.scan_ledger.forget(member_id)
+                raise
+        
+        for event in events:
+            self.events.publish("scan", event)
+        
+        accepted = sum(1 for result in results if result['status'] == "valid")
+        return {
+            "results": results,
+            "accepted": accepted,
+            "rejected": len(results) - accepted,
+            "gatewayScannedToday": scanned_today
+        }
+    
+    def _mark_gateway_synced(self, cursor: sqlite3.Cursor, gateway_id: str, pending_uploads: int):
+        cursor.execute("""
+            UPDATE gateways 
+            SET last_sync_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE gateway_id = ?
+        """, (gateway_id,))
+        
+        # sync_status / pending_uploads only exist once migration 1.3.0 is applied
+        cursor.execute("PRAGMA table_info(gateways)")
+        columns = {row['name'] for row in cursor.fetchall()}
+        if 'pending_uploads' in columns:
+            cursor.execute("""
+                UPDATE gateways 
+                SET pending_uploads = ?, sync_status = ?
+                WHERE gateway_id = ?
+            """, (pending_uploads, 'synced' if pending_uploads == 0 else 'pending', gateway_id))
     
     def get_stats(self, gateway_id: str = None) -> Dict:
         """Get system statistics"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            summary = self._count_summary(cursor, gateway_id)
+            
+            # Get all members with scan info
+            if gateway_id:
+                cursor.execute("""
+                    SELECT m.*, 
+                           COALESCE(a.scan_count, 0) as scan_count,
+                           a.last_scanned_at, a.last_gateway_id
+                    FROM members m
+                    LEFT JOIN member_scan_stats a ON a.member_id = m.id
+                    WHERE m.gateway_id = ? AND m.is_active = 1
+                    ORDER BY m.created_at DESC
+                """, (gateway_id,))
+            else:
+                cursor.execute("""
+                    SELECT m.*, 
+                           COALESCE(a.scan_count, 0) as scan_count,
+                           a.last_scanned_at, a.last_gateway_id
+                    FROM members m
+                    LEFT JOIN member_scan_stats a ON a.member_id = m.id
+                    WHERE m.is_active = 1
+                    ORDER BY m.created_at DESC
+                """)
+            
+            members = [dict(row) for row in cursor.fetchall()]
+            
         
+        return {
+            "totalMembers": summary['totalMembers'],
+            "scannedToday": summary['scannedToday'],
+            "members": members
+        }
+    
+    def get_stats_summary(self, gateway_id: str = None) -> Dict:
+        """Get member and scan counters without loading any members"""
+        with self.get_connection() as conn:
+            return self._count_summary(conn.cursor(), gateway_id)
+    
+    def _count_summary(self, cursor: sqlite3.Cursor, gateway_id: str = None) -> Dict:
         # Total members
         if gateway_id:
             cursor.execute("SELECT COUNT(*) as count FROM members WHERE gateway_id = ? AND is_active = 1", (gateway_id,))
@@ -352,105 +1190,215 @@ class Database:
             """, (today,))
         scanned_today = cursor.fetchone()['count']
         
-        # Get all members with scan info
+        return {
+            "totalMembers": total_members,
+            "scannedToday": scanned_today
+        }
+    
+    def get_members_page(self, gateway_id: str = None, constituency: str = None,
+                         designation: str = None, scanned: Optional[bool] = None,
+                         sort: str = "created_at", order: str = "desc",
+                         limit: Optional[int] = None, cursor_token: str = None) -> Dict:
+        """
+        Get one page of active members with scan info, using keyset pagination
+        scanned filters on whether the member has a valid scan today
+        Returns: {"members": [...], "nextCursor": token or None}
+        """
+        if sort not in MEMBER_SORT_COLUMNS:
+            raise ValueError(f"Invalid sort '{sort}'. Allowed: {', '.join(MEMBER_SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("Invalid order. Allowed: asc, desc")
+        
+        sort_column = MEMBER_SORT_COLUMNS[sort]
+        conditions = ["m.is_active = 1"]
+        params: list = []
+        
         if gateway_id:
-            cursor.execute("""
-                SELECT m.*, 
-                       (SELECT COUNT(*) FROM scan_history WHERE member_id = m.id AND is_valid = 1) as scan_count,
-                       (SELECT scanned_at FROM scan_history WHERE member_id = m.id AND is_valid = 1 ORDER BY scanned_at DESC LIMIT 1) as last_scanned_at
-                FROM members m
-                WHERE m.gateway_id = ? AND m.is_active = 1
-                ORDER BY m.created_at DESC
-            """, (gateway_id,))
-        else:
-            cursor.execute("""
-                SELECT m.*, 
-                       (SELECT COUNT(*) FROM scan_history WHERE member_id = m.id AND is_valid = 1) as scan_count,
-                       (SELECT scanned_at FROM scan_history WHERE member_id = m.id AND is_valid = 1 ORDER BY scanned_at DESC LIMIT 1) as last_scanned_at
-                FROM members m
-                WHERE m.is_active = 1
-                ORDER BY m.created_at DESC
-            """)
+            conditions.append("m.gateway_id = ?")
+            params.append(gateway_id)
+        if constituency:
+            conditions.append("m.constituency = ?")
+            params.append(constituency)
+        if designation:
+            conditions.append("m.designation = ?")
+            params.append(designation)
+        if scanned is not None:
+            conditions.append(
+                f"{'' if scanned else 'NOT '}EXISTS (SELECT 1 FROM scan_history s "
+                "WHERE s.member_id = m.id AND s.scan_date = ? AND s.is_valid = 1)"
+            )
+            params.append(datetime.now().date())
+        if cursor_token:
+            # Keyset condition: continue strictly after the last row returned
+            last_value, last_id = _decode_cursor(cursor_token)
+            comparison = "<" if order == "desc" else ">"
+            conditions.append(f"({sort_column}, m.id) {comparison} (?, ?)")
+            params.extend([last_value, last_id])
         
-        members = [dict(row) for row in cursor.fetchall()]
+        sql = f"""
+            SELECT m.*, 
+                   COALESCE(a.scan_count, 0) as scan_count,
+                   a.last_scanned_at, a.last_gateway_id
+            FROM members m
+            LEFT JOIN member_scan_stats a ON a.member_id = m.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {sort_column} {order.upper()}, m.id {order.upper()}
+        """
+        if limit is not None:
+            # Fetch one extra row to know whether another page exists
+            sql += " LIMIT ?"
+            params.append(limit + 1)
         
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            members = [dict(row) for row in cursor.fetchall()]
+        
+        next_cursor = None
+        if limit is not None and len(members) > limit:
+            members = members[:limit]
+            last = members[-1]
+            next_cursor = _encode_cursor(last[sort], last['id'])
         
         return {
-            "totalMembers": total_members,
-            "scannedToday": scanned_today,
-            "members": members
+            "members": members,
+            "nextCursor": next_cursor
         }
     
+    def iter_member_export(self, gateway_id: str = None, uploaded_from: str = None,
+                           uploaded_before: str = None, batch_size: int = 1000):
+        """
+        Yield active members with scan info, newest uploads first, in batches of sqlite3.Row
+        uploaded_from / uploaded_before bound upload_date (inclusive / exclusive)
+        The connection is held until the generator is exhausted or closed
+        """
+        conditions = ["m.is_active = 1"]
+        params: list = []
+        if gateway_id:
+            conditions.append("m.gateway_id = ?")
+            params.append(gateway_id)
+        if uploaded_from:
+            conditions.append("m.upload_date >= ?")
+            params.append(uploaded_from)
+        if uploaded_before:
+            conditions.append("m.upload_date < ?")
+            params.append(uploaded_before)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT m.name, m.designation, m.constituency, m.constituency_number,
+                       m.mobile_number, m.qr_code_id, m.upload_date, m.gateway_id,
+                       a.last_scanned_at, COALESCE(a.scan_count, 0) as scan_count
+                FROM members m
+                LEFT JOIN member_scan_stats a ON a.member_id = m.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY m.upload_date DESC, m.id DESC
+            """, params)
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+    
     def create_upload_batch(self, gateway_id: str, file_name: str, 
-                           uploaded_by: str = "admin") -> str:
+                           uploaded_by: str = "admin", status: str = "completed") -> str:
         """Create a new upload batch and return batch_id"""
-        batch_id = f"BATCH-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        # Random suffix keeps batch IDs unique for uploads in the same second
+        batch_id = f"BATCH-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6].upper()}"
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO upload_batches (batch_id, gateway_id, file_name, uploaded_by)
-            VALUES (?, ?, ?, ?)
-        """, (batch_id, gateway_id, file_name, uploaded_by))
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO upload_batches (batch_id, gateway_id, file_name, uploaded_by, status, worker_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (batch_id, gateway_id, file_name, uploaded_by, status, self.worker_id))
+            conn.commit()
         
         return batch_id
     
-    def update_upload_batch(self, batch_id: str, total: int, successful: int, failed: int):
-        """Update upload batch statistics"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE upload_batches 
-            SET total_records = ?, successful_records = ?, failed_records = ?
-            WHERE batch_id = ?
-        """, (total, successful, failed, batch_id))
-        conn.commit()
-        conn.close()
+    def update_upload_batch(self, batch_id: str, total: int, successful: int, failed: int,
+                            status: str = None):
+        """Update upload batch statistics and, if given, its status"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE upload_batches 
+                SET total_records = ?, successful_records = ?, failed_records = ?,
+                    status = COALESCE(?, status)
+                WHERE batch_id = ?
+            """, (total, successful, failed, status, batch_id))
+            conn.commit()
+    
+    def get_upload_batch(self, batch_id: str) -> Optional[Dict]:
+        """Get a single upload batch"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM upload_batches WHERE batch_id = ?", (batch_id,))
+            batch = cursor.fetchone()
+        return dict(batch) if batch else None
+    
+    def fail_interrupted_upload_batches(self, live_workers: List[str] = ()) -> int:
+        """Mark batches left queued or processing by a previous run as failed;
+        batches of the given running workers are left alone"""
+        live_workers = list(live_workers)
+        placeholders = ", ".join("?" * len(live_workers))
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                UPDATE upload_batches SET status = 'failed'
+                WHERE status IN ('queued', 'processing')
+                  AND COALESCE(worker_id, '') NOT IN ({placeholders})
+            """, live_workers)
+            conn.commit()
+            return cursor.rowcount
     
     def get_upload_history(self, gateway_id: str = None) -> List[Dict]:
         """Get upload history"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if gateway_id:
-            cursor.execute("""
-                SELECT * FROM upload_batches 
-                WHERE gateway_id = ?
-                ORDER BY upload_date DESC
-            """, (gateway_id,))
-        else:
-            cursor.execute("SELECT * FROM upload_batches ORDER BY upload_date DESC")
-        
-        batches = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            if gateway_id:
+                cursor.execute("""
+                    SELECT * FROM upload_batches 
+                    WHERE gateway_id = ?
+                    ORDER BY upload_date DESC
+                """, (gateway_id,))
+            else:
+                cursor.execute("SELECT * FROM upload_batches ORDER BY upload_date DESC")
+            
+            batches = [dict(row) for row in cursor.fetchall()]
         return batches
     
     def apply_migration(self, version: str, description: str, migration_script: str):
         """Apply database migration"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Execute migration script
-        cursor.executescript(migration_script)
-        
-        # Record migration
-        cursor.execute("""
-            INSERT INTO version_history (version, description, migration_script)
-            VALUES (?, ?, ?)
-        """, (version, description, migration_script))
-        
-        # Update system version
-        cursor.execute("""
-            UPDATE system_config 
-            SET config_value = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE config_key = 'system_version'
-        """, (version,))
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Execute migration script
+            cursor.executescript(migration_script)
+            
+            # Record migration
+            cursor.execute("""
+                INSERT INTO version_history (version, description, migration_script)
+                VALUES (?, ?, ?)
+            """, (version, description, migration_script))
+            
+            # Update system version
+            cursor.execute("""
+                UPDATE system_config 
+                SET config_value = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE config_key = 'system_version'
+            """, (version,))
+            
+            # Pick up any columns the migration added to scan_history, and
+            # check the whole schema again on the next startup
+            self._refresh_scan_history_view(cursor)
+            cursor.execute("PRAGMA user_version = 0")
+            self._signal(cursor, "invalidate", {"version": version})
+            
+            conn.commit()
     
     def get_current_version(self) -> str:
         """Get current system version"""
@@ -458,9 +1406,8 @@ class Database:
     
     def get_version_history(self) -> List[Dict]:
         """Get version history"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM version_history ORDER BY applied_at DESC")
-        versions = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM version_history ORDER BY applied_at DESC")
+            versions = [dict(row) for row in cursor.fetchall()]
         return versions
@@ -0,0 +1,123 @@
+"""
+In-process event broadcaster for live dashboards
+Database writes publish events from worker threads; each subscriber gets
+them on its own asyncio queue. A ring buffer of recent events lets
+reconnecting clients resume from the last event id they saw.
+"""
+
+import asyncio
+import threading
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+# Recent events kept for resuming clients
+DEFAULT_HISTORY_SIZE = 1000
+# Undelivered events per subscriber before it is told to resync
+DEFAULT_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.max_pending = max_pending
+        self.overflowed = False
+
+    def push(self, event: Dict):
+        """Hand an event to the subscriber's loop (safe from any thread)"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _put(self, event: Dict):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            # Slow consumer: drop its backlog and tell it to resync
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        """Wait for the next event; None means the subscriber must resync
+        Raises asyncio.TimeoutError when nothing arrives within timeout"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroadcaster:
+    def __init__(self, history_size: int = DEFAULT_HISTORY_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        # Event ids are "<stream>:<seq>"; the stream id changes on restart so
+        # ids from a previous process are never mistaken for current ones
+        self.stream_id = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self._seq = 0
+        self._history: Deque[Dict] = deque(maxlen=history_size)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def last_event_id(self) -> str:
+        return self._format_id(self._seq)
+
+    def _format_id(self, seq: int) -> str:
+        return f"{self.stream_id}:{seq}"
+
+    def publish(self, event_type: str, data: Dict) -> Dict:
+        """Assign the next sequence number and fan the event out"""
+        with self._lock:
+            self._seq += 1
+            event = {"id": self._format_id(self._seq), "seq": self._seq,
+                     "type": event_type, "data": data}
+            self._history.append(event)
+            self.published += 1
+            # Pushed under the lock so every subscriber sees the same order
+            for subscriber in self._subscribers:
+                subscriber.push(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscription, List[Dict], bool]:
+        """
+        Register a subscriber on the running event loop
+        Returns: (subscription, missed events since last_event_id, needs_resync)
+        needs_resync is True when the missed events are no longer buffered
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed, resync = self._events_since(last_event_id)
+        return subscription, missed, resync
+
+    def _events_since(self, last_event_id: Optional[str]) -> Tuple[List[Dict], bool]:
+        if not last_event_id:
+            return [], False
+
+        stream_id, _, seq = last_event_id.partition(":")
+        if stream_id != self.stream_id or not seq.isdigit() or int(seq) > self._seq:
+            return [], True
+
+        seq = int(seq)
+        oldest = self._history[0]['seq'] if self._history else self._seq + 1
+        if seq + 1 < oldest:
+            return [], True
+        return [event for event in self._history if event['seq'] > seq], False
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def get_metrics(self) -> Dict:
+        """Get broadcaster state"""
+        return {
+            "lastEventId": self.last_event_id,
+            "published": self.published,
+            "buffered": len(self._history),
+            "subscribers": len(self._subscribers)
+        }
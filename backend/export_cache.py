@@ -0,0 +1,161 @@
+"""
+On-disk cache of generated member exports
+Entries are keyed by format, filters and the database data version, so an
+entry never goes stale: any change to members or scans yields a new key.
+Least recently used files are evicted once the cache exceeds its size limit.
+Worker processes can share the directory: the limit applies to all files in
+it, and an export built by one worker is served by the others.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from coordination import pid_alive
+
+DEFAULT_EXPORT_CACHE_SIZE = 256 * 1024 * 1024
+CACHE_SUFFIX = ".export"
+TEMP_SUFFIX = ".tmp"
+# Temp files are named "<pid>-....tmp"; ones older than this are removed at
+# startup even if a process with that id runs (the id may have been reused)
+STALE_TEMP_SECONDS = 3600
+
+
+class ExportCache:
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_EXPORT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # key -> file size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        # Data versions persist in the database, so files from a previous
+        # run are still valid; only leftovers of interrupted exports go
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(TEMP_SUFFIX) and self._is_stale_temp(name):
+                self.discard_temp(os.path.join(self.cache_dir, name))
+
+        with self._lock:
+            self._rescan()
+            self._evict()
+
+    def _is_stale_temp(self, name: str) -> bool:
+        # Other workers may still be writing their temp files; this process
+        # has just started, so any with its own pid are leftovers
+        pid = name.split("-", 1)[0]
+        if pid.isdigit() and int(pid) != os.getpid() and pid_alive(int(pid)):
+            try:
+                age = time.time() - os.stat(os.path.join(self.cache_dir, name)).st_mtime
+            except FileNotFoundError:
+                return False
+            return age > STALE_TEMP_SECONDS
+        return True
+
+    def _rescan(self):
+        # Other workers add and evict files too, so the size limit is applied
+        # to the directory rather than to the exports this process stored
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, name[:-len(CACHE_SUFFIX)], stat.st_size))
+
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(files))
+        self.total_bytes = sum(self._entries.values())
+
+    @staticmethod
+    def make_key(export_format: str, data_version: int, **filters) -> str:
+        """Cache key (also used as the ETag) for an export"""
+        raw = json.dumps([export_format, data_version, filters], sort_keys=True)
+        return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """Open a cached export for reading, or return None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                # Possibly built by another worker sharing the directory
+                try:
+                    size = os.stat(self._path(key)).st_size
+                except FileNotFoundError:
+                    self.misses += 1
+                    return None
+                self._entries[key] = size
+                self.total_bytes += size
+            try:
+                fileobj = open(self._path(key), "rb")
+            except FileNotFoundError:
+                self.total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Keep the on-disk order in step for the next restart
+            os.utime(self._path(key))
+        return fileobj
+
+    def create_temp(self) -> Tuple[BinaryIO, str]:
+        """Open a temp file in the cache directory for a new export"""
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{os.getpid()}-", suffix=TEMP_SUFFIX)
+        return os.fdopen(fd, "w+b"), path
+
+    def discard_temp(self, path: str):
+        """Remove a temp file whose export failed"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def store(self, key: str, temp_path: str) -> BinaryIO:
+        """Move a finished export into the cache and open it for reading"""
+        path = self._path(key)
+        os.replace(temp_path, path)
+        # Opened before eviction so the caller can still send the file even
+        # if it is evicted straight away
+        fileobj = open(path, "rb")
+        with self._lock:
+            self._rescan()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._evict()
+        return fileobj
+
+    def _evict(self):
+        while self._entries and self.total_bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get_metrics(self) -> Dict:
+        """Get cache size and hit counters"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
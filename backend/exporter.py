@@ -0,0 +1,149 @@
+"""
+Member export for /api/download
+Rows are read from the database in batches and written incrementally to a
+file object, so memory stays flat regardless of roster size
+"""
+
+import csv
+import io
+from datetime import date, timedelta
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from database import Database
+
+# (column header, members query column) in export order
+EXPORT_COLUMNS = [
+    ("Name", "name"),
+    ("Designation", "designation"),
+    ("Constituency", "constituency"),
+    ("Constituency Number", "constituency_number"),
+    ("Mobile Number", "mobile_number"),
+    ("QR Code ID", "qr_code_id"),
+    ("Upload Date", "upload_date"),
+    ("Gateway ID", "gateway_id"),
+    ("Last Scanned At", "last_scanned_at"),
+    ("Scan Count", "scan_count"),
+]
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def parquet_available() -> bool:
+    """Parquet export needs the optional pyarrow package"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def upload_date_bounds(from_date: Optional[str], to_date: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Convert an inclusive YYYY-MM-DD range to upload_date bounds
+    Returns: (uploaded_from, uploaded_before); raises ValueError on bad dates
+    """
+    try:
+        start = date.fromisoformat(from_date) if from_date else None
+        end = date.fromisoformat(to_date) if to_date else None
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format")
+    if start and end and start > end:
+        raise ValueError("fromDate must not be after toDate")
+
+    return (
+        start.isoformat() if start else None,
+        (end + timedelta(days=1)).isoformat() if end else None
+    )
+
+
+def write_export(db: Database, fileobj: BinaryIO, export_format: str,
+                 gateway_id: str = None, uploaded_from: str = None,
+                 uploaded_before: str = None) -> int:
+    """
+    Write active members to fileobj in the given format
+    Returns: number of member rows written
+    """
+    writer = _WRITERS[export_format]
+    batches = db.iter_member_export(gateway_id, uploaded_from, uploaded_before,
+                                    batch_size=EXPORT_BATCH_SIZE)
+    try:
+        return writer(fileobj, batches)
+    finally:
+        batches.close()
+
+
+def _row_values(row) -> tuple:
+    return tuple(row[column] if row[column] is not None else '' for _, column in EXPORT_COLUMNS)
+
+
+def _write_xlsx(fileobj: BinaryIO, batches) -> int:
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows into the sheet instead of keeping cells in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Members")
+    sheet.append([header for header, _ in EXPORT_COLUMNS])
+
+    count = 0
+    for rows in batches:
+        for row in rows:
+            sheet.append(_row_values(row))
+        count += len(rows)
+
+    workbook.save(fileobj)
+    return count
+
+
+def _write_csv(fileobj: BinaryIO, batches) -> int:
+    # utf-8-sig so Excel detects the encoding of non-ASCII names
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow([header for header, _ in EXPORT_COLUMNS])
+
+    count = 0
+    for rows in batches:
+        writer.writerows(_row_values(row) for row in rows)
+        count += len(rows)
+
+    text.flush()
+    # Leave fileobj open for the caller
+    text.detach()
+    return count
+
+
+def _write_parquet(fileobj: BinaryIO, batches) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (header, pa.int64() if column == "scan_count" else pa.string())
+        for header, column in EXPORT_COLUMNS
+    ])
+
+    count = 0
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for rows in batches:
+            columns: Dict[str, list] = {header: [] for header, _ in EXPORT_COLUMNS}
+            for row in rows:
+                for header, column in EXPORT_COLUMNS:
+                    value = row[column]
+                    columns[header].append(value if column == "scan_count" or value is None else str(value))
+            writer.write_table(pa.table(columns, schema=schema))
+            count += len(rows)
+
+        if count == 0:
+            writer.write_table(schema.empty_table())
+    return count
+
+
+_WRITERS = {
+    "xlsx": _write_xlsx,
+    "csv": _write_csv,
+    "parquet": _write_parquet,
+}
@@ -0,0 +1,95 @@
+"""
+Index management for the members, scan_history and upload_batches tables
+Indexes are declared here, next to the queries they serve, and
+ensure_indexes() brings a database in line with them: missing indexes are
+created, changed ones rebuilt and superseded ones dropped.
+Run query_plans.py to check the hot queries still use them.
+"""
+
+import sqlite3
+import zlib
+from typing import Dict, List, Tuple
+
+# name -> (table, columns)
+INDEXES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    # Duplicate scan check, "scanned" member filter, scanned today, scan
+    # ledger and snapshot: scan_date = ? AND is_valid = 1 [AND member_id = ?]
+    "idx_scan_history_day_member": ("scan_history", ("scan_date", "is_valid", "member_id", "scanned_at", "gateway_id")),
+    # Scanned today at a gateway: scan_date = ? AND gateway_id = ? AND is_valid = 1
+    "idx_scan_history_day_gateway": ("scan_history", ("scan_date", "gateway_id", "is_valid", "member_id")),
+
+    # Member listings and counts (sort columns end with the implicit rowid,
+    # which is the keyset tie-breaker)
+    "idx_members_upload_date": ("members", ("upload_date",)),
+    "idx_members_active_created": ("members", ("is_active", "created_at")),
+    "idx_members_gateway_active_created": ("members", ("gateway_id", "is_active", "created_at")),
+    "idx_members_active_upload_date": ("members", ("is_active", "upload_date")),
+    "idx_members_active_name": ("members", ("is_active", "name")),
+    "idx_members_active_qr_code": ("members", ("is_active", "qr_code_id")),
+    # Filtered listings in the default (newest first) order
+    "idx_members_constituency": ("members", ("constituency", "is_active", "created_at")),
+    "idx_members_designation": ("members", ("designation", "is_active", "created_at")),
+    # Delta member sync: change_seq > ? ORDER BY change_seq
+    "idx_members_change_seq": ("members", ("change_seq",)),
+    # Exports ORDER BY upload_date DESC, optionally within an upload_date
+    # range; unfiltered exports use idx_members_active_upload_date
+    "idx_members_gateway_active_upload_date": ("members", ("gateway_id", "is_active", "upload_date")),
+
+    # Upload history, newest first, and batches left running at startup
+    "idx_upload_batches_upload_date": ("upload_batches", ("upload_date",)),
+    "idx_upload_batches_gateway_date": ("upload_batches", ("gateway_id", "upload_date")),
+    "idx_upload_batches_status": ("upload_batches", ("status",)),
+}
+
+# Superseded by the indexes above; qr_code_id already has the UNIQUE
+# constraint's index
+OBSOLETE_INDEXES: List[str] = [
+    "idx_members_qr_code",
+    "idx_scan_history_date",
+    "idx_scan_history_member",
+    "idx_scan_history_gateway",
+]
+
+
+def index_sql(name: str) -> str:
+    table, columns = INDEXES[name]
+    return f"CREATE INDEX {name} ON {table}({', '.join(columns)})"
+
+
+def indexes_checksum() -> int:
+    """Checksum of the declared indexes, part of the schema stamp that lets
+    startup skip ensure_indexes (see database.SCHEMA_VERSION)"""
+    declared = [index_sql(name) for name in sorted(INDEXES)] + sorted(OBSOLETE_INDEXES)
+    return zlib.crc32("\n".join(declared).encode())
+
+
+def ensure_indexes(cursor: sqlite3.Cursor) -> Dict[str, List[str]]:
+    """
+    Create, rebuild and drop indexes to match INDEXES
+    Returns: {"created": [...], "dropped": [...]}
+    """
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    existing = {row['name']: row['sql'] for row in cursor.fetchall()}
+    created, dropped = [], []
+
+    for name in OBSOLETE_INDEXES:
+        if name in existing:
+            cursor.execute(f"DROP INDEX {name}")
+            dropped.append(name)
+
+    for name in INDEXES:
+        sql = index_sql(name)
+        if existing.get(name) == sql:
+            continue
+        if name in existing:
+            # Definition changed (or was created by an older version)
+            cursor.execute(f"DROP INDEX {name}")
+            dropped.append(name)
+        cursor.execute(sql)
+        created.append(name)
+
+    if created:
+        # Refresh planner statistics for the new indexes
+        cursor.execute("PRAGMA optimize")
+
+    return {"created": created, "dropped": dropped}
@@ -1,15 +1,57 @@
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Path, Request, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import pandas as pd
+from pydantic import BaseModel, Field
 import os
+import asyncio
+import functools
+import hmac
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
-from database import Database
+from typing import List, Optional
+from database import DEFAULT_SCAN_CLOCK_SKEW, Database
+from export_cache import DEFAULT_EXPORT_CACHE_SIZE, ExportCache
+from exporter import EXPORT_FORMATS, parquet_available, upload_date_bounds, write_export
+from snapshot import build_snapshot
+from scan_writer import DEFAULT_SCAN_WRITE_MODE, SCAN_WRITE_MODES, ScanWriter
+from coordination import DEFAULT_POLL_INTERVAL, WorkerCoordinator
+from archive import DEFAULT_HOT_DAYS, archive_closed_days, get_archive_status
+from metrics import MetricsRegistry, QueryMetrics, RequestMetricsMiddleware
+from profiler import DEFAULT_SAMPLE_INTERVAL_MS, MAX_PROFILE_SECONDS, ProfilerManager
+from member_import import REQUIRED_COLUMNS, UnsupportedFileError, read_member_chunks
+from upload_jobs import UploadJobManager
+from storage_profile import STORAGE_PROFILES, DEFAULT_STORAGE_PROFILE, DEFAULT_CHECKPOINT_INTERVAL, CheckpointManager
 
-app = FastAPI(title="QR Party Member Identification System - Offline Local")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Register before loading the caches so other workers' changes made
+    # meanwhile are replayed from worker_signals
+    coordinator.register()
+    db.warm_member_cache()
+    # Replays journaled scans before the ledger is loaded from scan_history
+    scan_writer.start()
+    db.load_scan_ledger()
+    db.fail_interrupted_upload_batches(coordinator.get_live_workers())
+    coordinator.start()
+    checkpointer.start()
+    profiler.start_watcher()
+    yield
+    # Commit queued scans, finish running imports, flush the WAL and close
+    # pooled database connections
+    scan_writer.stop()
+    upload_jobs.shutdown()
+    db_executor.shutdown(wait=True)
+    checkpointer.stop()
+    profiler.stop()
+    coordinator.stop()
+    db.close()
+
+app = FastAPI(title="QR Party Member Identification System - Offline Local", lifespan=lifespan)
 
 # Allow CORS since Vite runs on a different port
 app.add_middleware(
@@ -20,22 +62,176 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics, exposed at /api/metrics
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram(
+    "qr_http_request_seconds", "HTTP request latency", ("method", "route", "status"))
+db_call_seconds = metrics.histogram(
+    "qr_db_call_seconds", "Blocking database calls made by request handlers", ("call",))
+db_executor_wait_seconds = metrics.histogram(
+    "qr_db_executor_wait_seconds", "Time database calls wait for a database thread")
+# Statements slower than this many milliseconds are logged (0 disables)
+query_metrics = QueryMetrics(metrics, slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", "0")))
+app.add_middleware(RequestMetricsMiddleware, histogram=request_seconds)
+
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-DB_PATH = os.path.join(BASE_DIR, "party_members.db")
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join(BASE_DIR, "uploads"))
+DB_PATH = os.environ.get("DB_PATH", os.path.join(BASE_DIR, "party_members.db"))
 
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
 # Initialize Database
-db = Database(DB_PATH)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+STORAGE_PROFILE = os.environ.get("STORAGE_PROFILE", DEFAULT_STORAGE_PROFILE)
+MEMBER_CACHE_SIZE = int(os.environ.get("MEMBER_CACHE_SIZE", "0"))
+# Per-statement timing costs a few microseconds per query; DB_QUERY_METRICS=0 turns it off
+DB_QUERY_METRICS = os.environ.get("DB_QUERY_METRICS", "1") != "0"
+# Worker processes, read by uvicorn and gunicorn as the default --workers
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", "1"))
+db = Database(DB_PATH, pool_size=DB_POOL_SIZE, storage_profile=STORAGE_PROFILE,
+              member_cache_size=MEMBER_CACHE_SIZE,
+              query_metrics=query_metrics if DB_QUERY_METRICS else None,
+              multi_worker=WORKERS > 1)
+if db.get_system_config('slow_query_ms'):
+    query_metrics.slow_query_ms = float(db.get_system_config('slow_query_ms'))
+db.scan_clock_skew = float(db.get_system_config('scan_clock_skew_seconds')
+                          or os.environ.get("SCAN_CLOCK_SKEW", str(DEFAULT_SCAN_CLOCK_SKEW)))
+
+# Database calls block, so handlers run them on a bounded thread pool
+# instead of the event loop. One thread per pooled connection means a
+# thread never waits for a connection.
+DB_WORKERS = int(os.environ.get("DB_WORKERS", str(DB_POOL_SIZE)))
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database call on the database thread pool"""
+    loop = asyncio.get_running_loop()
+    # functools.partial (e.g. export builders) has no __name__ of its own
+    name = getattr(func, "__name__", None) or getattr(getattr(func, "func", None), "__name__", "call")
+    submitted = time.perf_counter()
+    
+    def timed_call():
+        started = time.perf_counter()
+        db_executor_wait_seconds.observe(started - submitted)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            db_call_seconds.observe(time.perf_counter() - started, name)
+    
+    return await loop.run_in_executor(db_executor, timed_call)
+
+# Single scans are validated in memory and group committed by one writer
+# thread (see scan_writer.py); a mode saved in system_config wins
+scan_writer = ScanWriter(
+    db,
+    journal_path=os.environ.get("SCAN_JOURNAL", DB_PATH + "-scans.journal"),
+    mode=db.get_system_config('scan_write_mode') or os.environ.get("SCAN_WRITE_MODE", DEFAULT_SCAN_WRITE_MODE)
+)
+
+# Background member imports
+UPLOAD_SPOOL_SIZE = 8 * 1024 * 1024
+UPLOAD_READ_CHUNK = 1024 * 1024
+upload_jobs = UploadJobManager(db)
+
+# Member exports
+EXPORT_READ_CHUNK = 64 * 1024
+export_cache = ExportCache(
+    os.environ.get("EXPORT_CACHE_DIR", os.path.join(UPLOAD_DIR, "export_cache")),
+    max_bytes=int(os.environ.get("EXPORT_CACHE_SIZE", str(DEFAULT_EXPORT_CACHE_SIZE)))
+)
+
+# Live stats stream: a comment line keeps idle connections open through proxies
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Background WAL checkpointing
+checkpointer = CheckpointManager(
+    db, interval=int(db.get_system_config('wal_checkpoint_interval') or DEFAULT_CHECKPOINT_INTERVAL)
+)
+
+# Keeps caches, the scan ledger and live streams in step across workers
+coordinator = WorkerCoordinator(
+    db, poll_interval=float(os.environ.get("WORKER_POLL_INTERVAL", str(DEFAULT_POLL_INTERVAL)))
+)
+
+def apply_remote_config(payload: dict):
+    """Apply a configuration change made through another worker"""
+    key, value = payload['key'], payload['value']
+    if key == 'storage_profile':
+        db.storage_profile = value
+        db.pool.recycle()
+    elif key == 'wal_checkpoint_interval':
+        checkpointer.interval = int(value)
+    elif key == 'slow_query_ms':
+        query_metrics.slow_query_ms = float(value)
+    elif key == 'scan_write_mode':
+        scan_writer.mode = value
+    elif key == 'scan_clock_skew_seconds':
+        db.scan_clock_skew = float(value)
+
+coordinator.on("config", apply_remote_config)
+
+# Sampling profiler, shared by all workers through system_config
+profiler = ProfilerManager(db, os.environ.get("PROFILE_DIR", os.path.join(UPLOAD_DIR, "profiles")))
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+def require_admin(token: Optional[str]):
+    """Check the X-Admin-Token header against ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+# Stats kept by the pool and caches, read when /api/metrics is scraped
+metrics.callback("qr_db_pool_connections", "Pooled database connections by state",
+                 lambda: {("in_use",): db.get_pool_metrics()['inUse'],
+                          ("idle",): db.get_pool_metrics()['idle']}, ("state",))
+metrics.callback("qr_db_pool_waits_total", "Connection checkouts that had to wait",
+                 lambda: db.get_pool_metrics()['waits'], kind="counter")
+metrics.callback("qr_db_pool_wait_seconds_total", "Time spent waiting for a pooled connection",
+                 lambda: db.get_pool_metrics()['waitTimeTotalMs'] / 1000, kind="counter")
+metrics.callback("qr_member_cache_entries", "Members held in the member cache",
+                 lambda: db.member_cache.get_metrics()['size'])
+metrics.callback("qr_member_cache_lookups_total", "Member cache lookups by result",
+                 lambda: {("hit",): db.member_cache.get_metrics()['hits'],
+                          ("miss",): db.member_cache.get_metrics()['misses']}, ("result",), kind="counter")
+metrics.callback("qr_scan_ledger_members", "Members scanned today according to the scan ledger",
+                 lambda: db.scan_ledger.get_metrics()['scannedMembers'])
+metrics.callback("qr_event_subscribers", "Open live stats streams",
+                 lambda: db.events.get_metrics()['subscribers'])
+metrics.callback("qr_worker_signals_applied_total", "Changes from other workers applied to this worker's caches",
+                 lambda: coordinator.applied, kind="counter")
+metrics.callback("qr_scan_writer_queued", "Scans waiting for the scan writer",
+                 lambda: scan_writer.get_metrics()['queued'])
+metrics.callback("qr_scan_writer_groups_total", "Group commits by the scan writer",
+                 lambda: scan_writer.groups, kind="counter")
+metrics.callback("qr_scan_writer_scans_total", "Scans committed by the scan writer",
+                 lambda: scan_writer.committed, kind="counter")
+metrics.callback("qr_export_cache_bytes", "Size of cached exports",
+                 lambda: export_cache.get_metrics()['bytes'])
+metrics.callback("qr_export_cache_lookups_total", "Export cache lookups by result",
+                 lambda: {("hit",): export_cache.hits, ("miss",): export_cache.misses}, ("result",), kind="counter")
 
 # Models
 class ScanRequest(BaseModel):
     qrId: str
     gatewayId: Optional[str] = "GATEWAY-001"
 
+# Scans accepted per /api/scan/batch request; larger queues are sent in parts
+MAX_SCAN_BATCH = 1000
+
+class BatchScanItem(BaseModel):
+    qrId: str
+    scannedAt: datetime
+
+class ScanBatchRequest(BaseModel):
+    gatewayId: Optional[str] = "GATEWAY-001"
+    scans: List[BatchScanItem] = Field(..., max_length=MAX_SCAN_BATCH)
+    pendingUploads: int = Field(default=0, ge=0)
+
 class GatewayRegistration(BaseModel):
     gatewayId: str
     gatewayName: str
@@ -49,7 +245,7 @@ class SystemConfig(BaseModel):
 
 @app.get("/")
 async def root():
-    version = db.get_current_version()
+    version = await run_db(db.get_current_version)
     return {
         "message": "QR Party Member API - Offline Local System", 
         "status": "ok",
@@ -59,20 +255,36 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    version = db.get_current_version()
-    gateways = db.get_active_gateways()
+    version = await run_db(db.get_current_version)
+    gateways = await run_db(db.get_active_gateways)
     return {
         "status": "healthy", 
         "database": os.path.exists(DB_PATH),
         "version": version,
-        "activeGateways": len(gateways)
+        "activeGateways": len(gateways),
+        "connectionPool": db.get_pool_metrics(),
+        "dbExecutor": {"workers": DB_WORKERS},
+        "memberCache": db.member_cache.get_metrics(),
+        "scanLedger": db.scan_ledger.get_metrics(),
+        "events": db.events.get_metrics(),
+        "dataVersion": await run_db(db.get_data_version),
+        "exportCache": export_cache.get_metrics(),
+        "storage": await run_db(db.get_storage_status),
+        "checkpoints": checkpointer.get_status(),
+        "scanWriter": scan_writer.get_metrics(),
+        "workers": coordinator.get_status()
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Request, database and cache metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/version")
 async def get_version():
     """Get current system version and history"""
-    current_version = db.get_current_version()
-    version_history = db.get_version_history()
+    current_version = await run_db(db.get_current_version)
+    version_history = await run_db(db.get_version_history)
     return {
         "currentVersion": current_version,
         "history": version_history
@@ -81,19 +293,20 @@ async def get_version():
 @app.get("/api/gateways")
 async def get_gateways():
     """Get all registered gateways"""
-    gateways = db.get_all_gateways()
+    gateways = await run_db(db.get_all_gateways)
     return {"gateways": gateways}
 
 @app.get("/api/gateways/active")
 async def get_active_gateways():
     """Get all active gateways"""
-    gateways = db.get_active_gateways()
+    gateways = await run_db(db.get_active_gateways)
     return {"gateways": gateways}
 
 @app.post("/api/gateways/register")
 async def register_gateway(gateway: GatewayRegistration):
     """Register a new gateway"""
-    success = db.register_gateway(
+    success = await run_db(
+        db.register_gateway,
         gateway.gatewayId, 
         gateway.gatewayName, 
         gateway.location or ""
@@ -107,104 +320,116 @@ async def register_gateway(gateway: GatewayRegistration):
 @app.post("/api/gateways/{gateway_id}/sync")
 async def sync_gateway(gateway_id: str):
     """Update gateway sync timestamp"""
-    db.update_gateway_sync(gateway_id)
+    await run_db(db.update_gateway_sync, gateway_id)
     return {"message": "Gateway sync updated", "gatewayId": gateway_id}
 
+# Field order of each row returned by the delta member sync
+SYNC_MEMBER_COLUMNS = [
+    "changeSeq", "qrCodeId", "name", "designation", "constituency",
+    "constituencyNumber", "mobileNumber", "uploadDate", "gatewayId", "isActive"
+]
+
+@app.get("/api/gateways/{gateway_id}/sync/members")
+async def sync_gateway_members(
+    gateway_id: str,
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=5000)
+):
+    """
+    Members added, changed or deactivated since the gateway's last sync
+    Start with since=0, then pass nextSince back until hasMore is false
+    """
+    changes = await run_db(db.sync_member_changes, gateway_id, since, limit)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Gateway not found")
+    return {"gatewayId": gateway_id, "columns": SYNC_MEMBER_COLUMNS, **changes}
+
 @app.post("/api/upload")
 async def upload_excel(
     file: UploadFile = File(...),
     gatewayId: str = Query(default="GATEWAY-001")
 ):
-    """Upload Excel file and import members with upload date tracking"""
+    """
+    Upload an Excel or CSV file and import members with upload date tracking
+    The import runs as a background job; poll /api/upload/{batchId}/status
+    """
+    # The request's upload file is closed once this handler returns, so
+    # copy it chunk by chunk into a spooled file the import job owns
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    chunks = None
     try:
-        # Save uploaded file temporarily
-        temp_file = os.path.join(UPLOAD_DIR, f"temp_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx")
-        with open(temp_file, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Read Excel file
-        df = pd.read_excel(temp_file)
-        
-        # Verify required columns
-        required_cols = {'Name', 'QR Code ID'}
-        if not required_cols.issubset(df.columns):
-            os.remove(temp_file)
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns. Required: {required_cols}"
-            )
-        
-        # Create upload batch
-        batch_id = db.create_upload_batch(gatewayId, file.filename)
-        
-        # Import members
-        total = len(df)
-        successful = 0
-        failed = 0
-        errors = []
-        
-        for idx, row in df.iterrows():
-            qr_code_id = str(row.get('QR Code ID', '')).strip()
-            name = str(row.get('Name', '')).strip()
-            
-            if not qr_code_id or not name:
-                failed += 1
-                errors.append(f"Row {idx + 2}: Missing QR Code ID or Name")
-                continue
-            
-            designation = str(row.get('Designation', '')).strip()
-            constituency = str(row.get('Constituency', '')).strip()
-            constituency_number = str(row.get('Constituency Number', '')).strip()
-            mobile_number = str(row.get('Mobile Number', '')).strip()
-            
-            success, message = db.add_member(
-                qr_code_id=qr_code_id,
-                name=name,
-                designation=designation,
-                constituency=constituency,
-                constituency_number=constituency_number,
-                mobile_number=mobile_number,
-                gateway_id=gatewayId,
-                upload_batch_id=batch_id
-            )
-            
-            if success:
-                successful += 1
-            else:
-                failed += 1
-                errors.append(f"Row {idx + 2}: {message}")
-        
-        # Update batch statistics
-        db.update_upload_batch(batch_id, total, successful, failed)
-        
-        # Clean up temp file
-        os.remove(temp_file)
-        
-        # Update gateway sync
-        db.update_gateway_sync(gatewayId)
-        
-        return {
-            "message": "Upload completed",
-            "batchId": batch_id,
-            "total": total,
-            "successful": successful,
-            "failed": failed,
-            "errors": errors[:10] if errors else [],  # Return first 10 errors
-            "uploadDate": datetime.now().isoformat()
-        }
+        while True:
+            data = await file.read(UPLOAD_READ_CHUNK)
+            if not data:
+                break
+            spool.write(data)
         
+        # Parse a fixed number of rows at a time instead of loading the whole sheet
+        chunks = read_member_chunks(spool, file.filename)
+        first_chunk = await run_db(next, chunks, None)
+        if first_chunk is None:
+            raise UnsupportedFileError("The file has no header row")
+    except UnsupportedFileError as e:
+        _close_upload(chunks, spool)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+        _close_upload(chunks, spool)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    # Verify required columns
+    if not REQUIRED_COLUMNS.issubset(first_chunk.columns):
+        _close_upload(chunks, spool)
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Missing required columns. Required: {REQUIRED_COLUMNS}"
+        )
+    
+    try:
+        # Create upload batch and queue the import
+        batch_id = await run_db(db.create_upload_batch, gatewayId, file.filename, status="queued")
+        upload_jobs.submit(
+            batch_id, gatewayId, file.filename,
+            _with_first_chunk(first_chunk, chunks), spool
+        )
+    except Exception as e:
+        _close_upload(chunks, spool)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "message": "Upload queued",
+        "batchId": batch_id,
+        "status": "queued",
+        "statusUrl": f"/api/upload/{batch_id}/status",
+        "uploadDate": datetime.now().isoformat()
+    }
+
+def _with_first_chunk(first_chunk, chunks):
+    try:
+        yield first_chunk
+        yield from chunks
+    finally:
+        chunks.close()
+
+def _close_upload(chunks, spool):
+    """Close a partly read upload; the parser first, since it still reads the spool"""
+    if chunks is not None:
+        chunks.close()
+    spool.close()
 
 @app.get("/api/upload/history")
 async def get_upload_history(gatewayId: Optional[str] = None):
     """Get upload history"""
-    history = db.get_upload_history(gatewayId)
+    history = await run_db(db.get_upload_history, gatewayId)
     return {"history": history}
 
+@app.get("/api/upload/{batchId}/status")
+async def get_upload_status(batchId: str):
+    """Get progress of a background upload job"""
+    status = await run_db(upload_jobs.get_status, batchId)
+    if not status:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+    return status
+
 @app.post("/api/scan")
 async def scan_qr(request: ScanRequest):
     """
@@ -217,27 +442,18 @@ async def scan_qr(request: ScanRequest):
     if not qr_id:
         raise HTTPException(status_code=400, detail="QR ID required")
     
-    # Validate scan
-    is_valid, message, member = db.validate_scan(qr_id, gateway_id)
+    # Validate and queue the scan (both valid and invalid are recorded); in
+    # "commit" mode wait for its group to commit
+    is_valid, message, member, scanned_today, commit = await run_db(scan_writer.submit, qr_id, gateway_id)
+    if commit:
+        await asyncio.wrap_future(commit)
     
     if not member:
         raise HTTPException(status_code=404, detail=message)
     
-    # Record scan (both valid and invalid)
-    db.record_scan(
-        qr_code_id=qr_id,
-        member_id=member['id'],
-        gateway_id=gateway_id,
-        is_valid=is_valid,
-        validation_message=message
-    )
-    
     if not is_valid:
         raise HTTPException(status_code=400, detail=message)
     
-    # Get updated stats
-    stats = db.get_stats(gateway_id)
-    
     # Format member data for response
     member_response = {
         "Name": member['name'],
@@ -248,21 +464,123 @@ async def scan_qr(request: ScanRequest):
         "QR Code ID": member['qr_code_id'],
         "Upload Date": member['upload_date'],
         "Gateway ID": member['gateway_id'],
-        "Scan Count": member.get('scan_count', 0) + 1,
+        "Scan Count": member.get('scan_count', 0),
         "Last Scanned At": datetime.now().isoformat()
     }
     
     return {
         "success": True,
         "member": member_response,
-        "globalCount": stats['scannedToday'],
+        "globalCount": scanned_today,
         "validationMessage": message
     }
 
+@app.post("/api/scan/batch")
+async def scan_batch(request: ScanBatchRequest):
+    """
+    Replay scans queued by a gateway while it was offline
+    Scans are validated in scannedAt order and recorded in one transaction;
+    pendingUploads is the number of scans the gateway still has queued
+    """
+    gateway_id = request.gatewayId or "GATEWAY-001"
+    
+    scans = []
+    for item in request.scans:
+        # Scan rules compare against local times, like /api/scan
+        scanned_at = item.scannedAt
+        if scanned_at.tzinfo:
+            scanned_at = scanned_at.astimezone().replace(tzinfo=None)
+        scans.append((item.qrId.strip(), scanned_at))
+    
+    result = await run_db(db.process_scan_batch, gateway_id, scans, request.pendingUploads)
+    return {"gatewayId": gateway_id, **result}
+
+@app.get("/api/stats/summary")
+async def get_stats_summary(gatewayId: Optional[str] = None):
+    """Get member and scan counters without the member list"""
+    return await run_db(db.get_stats_summary, gatewayId)
+
+def _format_event(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+@app.get("/api/stats/stream")
+async def stream_stats(
+    request: Request,
+    since: Optional[str] = None,
+    last_event_id: Optional[str] = Header(default=None)
+):
+    """
+    Server-Sent Events stream of new valid scans and member uploads
+    Reconnecting clients resume after Last-Event-ID (or ?since=); a "resync"
+    event means events were missed and /api/stats should be refetched
+    """
+    subscription, missed, resync = db.events.subscribe(last_event_id or since)
+    
+    async def event_stream():
+        try:
+            yield _format_event("ready", {"lastEventId": db.events.last_event_id})
+            if resync:
+                yield _format_event("resync", {"lastEventId": db.events.last_event_id})
+            for event in missed:
+                yield _format_event(event['type'], event['data'], event['id'])
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await subscription.get(EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    # Fell too far behind; the client reconnects and refetches
+                    yield _format_event("resync", {"lastEventId": db.events.last_event_id})
+                    break
+                yield _format_event(event['type'], event['data'], event['id'])
+        finally:
+            db.events.unsubscribe(subscription)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/api/stats")
-async def get_stats(gatewayId: Optional[str] = None):
-    """Get statistics for specific gateway or all gateways"""
-    stats = db.get_stats(gatewayId)
+async def get_stats(
+    gatewayId: Optional[str] = None,
+    constituency: Optional[str] = None,
+    designation: Optional[str] = None,
+    scanned: Optional[bool] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    includeMembers: bool = True
+):
+    """
+    Get statistics for specific gateway or all gateways
+    Members are paginated when limit is given; pass nextCursor back as cursor
+    """
+    try:
+        return await run_db(
+            _build_stats_response, gatewayId, constituency, designation, scanned,
+            sort, order, limit, cursor, includeMembers
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _build_stats_response(gateway_id, constituency, designation, scanned,
+                          sort, order, limit, cursor, include_members) -> JSONResponse:
+    # Built and JSON-encoded on the worker thread; encoding the full member
+    # list on the event loop would stall every other request
+    summary = db.get_stats_summary(gateway_id)
+    if not include_members:
+        return JSONResponse(summary)
+    
+    page = db.get_members_page(
+        gateway_id=gateway_id, constituency=constituency, designation=designation,
+        scanned=scanned, sort=sort, order=order, limit=limit, cursor_token=cursor
+    )
+    stats = {**summary, **page}
     
     # Format members for frontend
     members_formatted = []
@@ -278,70 +596,216 @@ async def get_stats(gatewayId: Optional[str] = None):
             "Gateway ID": member['gateway_id']
         })
     
-    return {
+    return JSONResponse({
         "totalMembers": stats['totalMembers'],
         "scannedToday": stats['scannedToday'],
-        "members": members_formatted
-    }
+        "members": members_formatted,
+        "nextCursor": stats['nextCursor']
+    })
 
 @app.get("/api/download")
-async def download_db():
-    """Download current database as Excel file"""
-    try:
-        stats = db.get_stats()
-        members = stats['members']
-        
-        # Convert to DataFrame
-        df_data = []
-        for member in members:
-            df_data.append({
-                "Name": member['name'],
-                "Designation": member['designation'],
-                "Constituency": member['constituency'],
-                "Constituency Number": member['constituency_number'],
-                "Mobile Number": member['mobile_number'],
-                "QR Code ID": member['qr_code_id'],
-                "Upload Date": member['upload_date'],
-                "Gateway ID": member['gateway_id'],
-                "Last Scanned At": member.get('last_scanned_at', ''),
-                "Scan Count": member.get('scan_count', 0)
-            })
-        
-        df = pd.DataFrame(df_data)
-        
-        # Save to Excel
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"members_db_{timestamp}.xlsx"
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        
-        df.to_excel(filepath, index=False)
-        
-        return FileResponse(
-            filepath, 
-            filename=filename, 
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+async def download_db(
+    format: str = "xlsx",
+    gatewayId: Optional[str] = None,
+    fromDate: Optional[str] = None,
+    toDate: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """
+    Download members as Excel, CSV or Parquet
+    Optional filters: gatewayId and an upload date range (fromDate/toDate, YYYY-MM-DD)
+    Unchanged exports are served from cache, or as 304 for a matching If-None-Match
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{format}'. Available: {', '.join(EXPORT_FORMATS)}"
         )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+    try:
+        uploaded_from, uploaded_before = upload_date_bounds(fromDate, toDate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Exports are cached per data version; the cache key doubles as the ETag
+    version = await run_db(db.get_data_version)
+    key = export_cache.make_key(format, version, gatewayId=gatewayId,
+                                uploadedFrom=uploaded_from, uploadedBefore=uploaded_before)
+    build = functools.partial(write_export, db, export_format=format, gateway_id=gatewayId,
+                              uploaded_from=uploaded_from, uploaded_before=uploaded_before)
+    filename = f"members_db_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return await _send_cached_export(key, build, EXPORT_FORMATS[format], filename, if_none_match)
+
+@app.get("/api/snapshot")
+async def download_snapshot(if_none_match: Optional[str] = Header(default=None)):
+    """
+    Download a validation snapshot (active members and today's scanned set)
+    for gateways to validate scans locally; read it with snapshot.SnapshotReader
+    """
+    version = await run_db(db.get_data_version)
+    today = datetime.now().date()
+    key = export_cache.make_key("snapshot", version, scanDate=today.isoformat())
+    build = functools.partial(build_snapshot, db, scan_date=today)
+    filename = f"members_snapshot_{today.strftime('%Y%m%d')}_v{version}.bin"
+    return await _send_cached_export(key, build, "application/octet-stream", filename, if_none_match)
+
+async def _send_cached_export(key: str, build, media_type: str, filename: str,
+                              if_none_match: Optional[str]):
+    """Stream a cached export, building it with build(fileobj) on a miss"""
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or
+                          etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    fileobj = export_cache.open(key)
+    if fileobj is None:
+        # Build on a worker thread straight into the cache directory
+        temp_file, temp_path = export_cache.create_temp()
+        try:
+            with temp_file:
+                await run_db(build, temp_file)
+            fileobj = export_cache.store(key, temp_path)
+        except Exception as e:
+            export_cache.discard_temp(temp_path)
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    headers["Content-Length"] = str(os.fstat(fileobj.fileno()).st_size)
+    return StreamingResponse(_iter_file(fileobj), media_type=media_type, headers=headers)
+
+def _iter_file(fileobj):
+    try:
+        while True:
+            data = fileobj.read(EXPORT_READ_CHUNK)
+            if not data:
+                break
+            yield data
+    finally:
+        fileobj.close()
+
+@app.get("/api/maintenance/archive")
+async def scan_archive_status():
+    """Get scan counts in scan_history and each archive table"""
+    return await run_db(get_archive_status, db)
+
+@app.post("/api/maintenance/archive")
+async def archive_scans(
+    hotDays: int = Query(DEFAULT_HOT_DAYS, ge=1),
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """Move scans older than the last hotDays days into the archive tables"""
+    require_admin(x_admin_token)
+    result = await run_db(archive_closed_days, db, hotDays)
+    return {"message": f"Archived {result['archivedRows']} scans", **result}
+
+@app.post("/api/admin/profile")
+async def start_profile(
+    seconds: float = Query(30, gt=0, le=MAX_PROFILE_SECONDS),
+    intervalMs: float = Query(DEFAULT_SAMPLE_INTERVAL_MS, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """Sample stacks in every worker for the given number of seconds"""
+    require_admin(x_admin_token)
+    try:
+        profile = await run_db(profiler.request, seconds, intervalMs)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "message": f"Profiling for {seconds:g} seconds",
+        "profileId": profile['profileId'],
+        "seconds": seconds,
+        "intervalMs": intervalMs
+    }
+
+@app.get("/api/admin/profile/{profileId}")
+async def get_profile(
+    profileId: str = Path(..., pattern=r"^[0-9]{14}-[0-9a-f]{6}$"),
+    format: str = Query("summary", pattern="^(summary|collapsed)$"),
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """Get a profile's summary, or its collapsed stacks for a flame graph"""
+    require_admin(x_admin_token)
+    if format == "collapsed":
+        collapsed = await run_db(profiler.get_collapsed, profileId)
+        if collapsed is None:
+            raise HTTPException(status_code=404, detail="Profile not found or still running")
+        return PlainTextResponse(collapsed, headers={
+            "Content-Disposition": f'attachment; filename="profile-{profileId}.collapsed"'
+        })
+
+    summary = await run_db(profiler.get_summary, profileId)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
 
 @app.get("/api/config")
 async def get_config():
     """Get system configuration"""
-    version = db.get_current_version()
-    gateways = db.get_active_gateways()
+    version = await run_db(db.get_current_version)
+    gateways = await run_db(db.get_active_gateways)
     
     return {
         "version": version,
         "gateways": gateways,
         "databaseType": "SQLite",
-        "offlineMode": True
+        "offlineMode": True,
+        "storageProfile": db.storage_profile,
+        "storageProfiles": {
+            name: profile['description'] for name, profile in STORAGE_PROFILES.items()
+        },
+        "walCheckpointInterval": checkpointer.interval,
+        "slowQueryMs": query_metrics.slow_query_ms,
+        "scanWriteMode": scan_writer.mode,
+        "scanWriteModes": SCAN_WRITE_MODES,
+        "scanClockSkewSeconds": db.scan_clock_skew
     }
 
+# Settings that trade durability for speed need the admin token
+ADMIN_CONFIG_KEYS = {'storage_profile', 'scan_write_mode'}
+
 @app.post("/api/config")
-async def set_config(config: SystemConfig):
+async def set_config(config: SystemConfig, x_admin_token: Optional[str] = Header(default=None)):
     """Set system configuration"""
-    db.set_system_config(config.key, config.value)
+    if config.key in ADMIN_CONFIG_KEYS:
+        require_admin(x_admin_token)
+    if config.key == 'storage_profile':
+        try:
+            await run_db(db.set_storage_profile, config.value)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif config.key == 'wal_checkpoint_interval':
+        if not config.value.isdigit() or int(config.value) < 1:
+            raise HTTPException(status_code=400, detail="wal_checkpoint_interval must be a positive number of seconds")
+        await run_db(db.set_system_config, config.key, config.value)
+        checkpointer.interval = int(config.value)
+    elif config.key == 'slow_query_ms':
+        try:
+            slow_query_ms = float(config.value)
+        except ValueError:
+            slow_query_ms = -1
+        if slow_query_ms < 0:
+            raise HTTPException(status_code=400, detail="slow_query_ms must be a number of milliseconds (0 disables)")
+        await run_db(db.set_system_config, config.key, config.value)
+        query_metrics.slow_query_ms = slow_query_ms
+    elif config.key == 'scan_write_mode':
+        if config.value not in SCAN_WRITE_MODES:
+            raise HTTPException(status_code=400, detail=f"scan_write_mode must be one of: {', '.join(SCAN_WRITE_MODES)}")
+        await run_db(db.set_system_config, config.key, config.value)
+        scan_writer.mode = config.value
+    elif config.key == 'scan_clock_skew_seconds':
+        try:
+            scan_clock_skew = float(config.value)
+        except ValueError:
+            scan_clock_skew = -1
+        if scan_clock_skew < 0:
+            raise HTTPException(status_code=400, detail="scan_clock_skew_seconds must be a number of seconds (0 disables)")
+        await run_db(db.set_system_config, config.key, config.value)
+        db.scan_clock_skew = scan_clock_skew
+    else:
+        await run_db(db.set_system_config, config.key, config.value)
+    await run_db(coordinator.broadcast, "config", {"key": config.key, "value": config.value})
     return {"message": "Configuration updated", "key": config.key}
 
 if __name__ == "__main__":
@@ -349,4 +813,8 @@ if __name__ == "__main__":
     print(f"Starting QR Party Member System v{db.get_current_version()}")
     print(f"Database: {DB_PATH}")
     print(f"Active Gateways: {len(db.get_active_gateways())}")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS > 1:
+        # Worker processes import the app themselves
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,76 @@
+"""
+Database maintenance tasks
+Run from the backend directory: python maintenance.py <command>
+"""
+
+import argparse
+import os
+import sys
+
+from archive import DEFAULT_HOT_DAYS, archive_closed_days, get_archive_status
+from database import Database
+
+
+def rebuild_aggregates(db: Database) -> int:
+    """Recompute per-member scan aggregates from scan_history"""
+    count = db.rebuild_scan_aggregates()
+    print(f"Rebuilt scan aggregates for {count} members")
+    return 0
+
+
+def verify_aggregates(db: Database) -> int:
+    """Check per-member scan aggregates against scan_history"""
+    result = db.verify_scan_aggregates()
+    mismatched = result['mismatched']
+    print(f"Checked {result['checked']} members, {len(mismatched)} mismatched")
+    if mismatched:
+        print(f"  Member IDs: {', '.join(str(m) for m in mismatched[:20])}")
+        print("Run 'python maintenance.py rebuild-aggregates' to repair")
+        return 1
+    return 0
+
+
+def check_schema(db: Database) -> int:
+    """Re-run the schema checks that startup skips for an up-to-date database"""
+    db.init_database(force=True)
+    print("Checked tables, views and indexes")
+    return 0
+
+
+def archive_scans(db: Database, hot_days: int = DEFAULT_HOT_DAYS) -> int:
+    """Move closed days of scan_history into the monthly archive tables"""
+    result = archive_closed_days(db, hot_days)
+    print(f"Archived {result['archivedRows']} scans from {result['days']} days before {result['before']}")
+    status = get_archive_status(db)
+    print(f"  scan_history: {status['hot']['rows']} scans")
+    for archive in status['archives']:
+        print(f"  {archive['table']}: {archive['rows']} scans")
+    return 0
+
+
+COMMANDS = {
+    "archive-scans": archive_scans,
+    "check-schema": check_schema,
+    "rebuild-aggregates": rebuild_aggregates,
+    "verify-aggregates": verify_aggregates,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "party_members.db"),
+                        help="Path to the SQLite database")
+    parser.add_argument("--hot-days", type=int, default=DEFAULT_HOT_DAYS,
+                        help="archive-scans: days to keep in scan_history, counting today")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        if args.command == "archive-scans":
+            status = archive_scans(db, args.hot_days)
+        else:
+            status = COMMANDS[args.command](db)
+    finally:
+        db.close()
+    sys.exit(status)
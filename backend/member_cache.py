@@ -0,0 +1,129 @@
+"""
+In-memory index of active members keyed by QR code ID
+Lets the scan path resolve members without touching SQLite
+"""
+
+import sys
+import threading
+from typing import Dict, Iterable, Optional
+
+
+class MemberRecord:
+    """Compact member record holding only the fields the scan path needs"""
+
+    __slots__ = ('id', 'qr_code_id', 'name', 'designation', 'constituency',
+                 'constituency_number', 'mobile_number', 'upload_date', 'gateway_id')
+
+    def __init__(self, id: int, qr_code_id: str, name: str, designation: str,
+                 constituency: str, constituency_number: str, mobile_number: str,
+                 upload_date: str, gateway_id: str):
+        self.id = id
+        self.qr_code_id = qr_code_id
+        self.name = name
+        # Designations, constituencies and gateways repeat across thousands
+        # of members, so share one string object per distinct value
+        self.designation = _intern(designation)
+        self.constituency = _intern(constituency)
+        self.constituency_number = _intern(constituency_number)
+        self.mobile_number = mobile_number
+        self.upload_date = upload_date
+        self.gateway_id = _intern(gateway_id)
+
+    @classmethod
+    def from_row(cls, row) -> "MemberRecord":
+        """Build a record from a members table row"""
+        return cls(
+            row['id'], row['qr_code_id'], row['name'], row['designation'],
+            row['constituency'], row['constituency_number'], row['mobile_number'],
+            row['upload_date'], row['gateway_id']
+        )
+
+    def to_dict(self) -> Dict:
+        """Convert to the dict shape returned by Database.get_member_by_qr"""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class MemberCache:
+    def __init__(self, max_entries: int = 0):
+        # max_entries of 0 means unbounded
+        self.max_entries = max_entries
+        self._records: Dict[str, MemberRecord] = {}
+        self._lock = threading.Lock()
+
+        # True once the cache holds every active member, so a miss means the
+        # QR code is unknown and the database does not need to be asked
+        self.complete = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, records: Iterable[MemberRecord]):
+        """Replace the cache contents with the full set of active members"""
+        fresh: Dict[str, MemberRecord] = {}
+        complete = True
+        for record in records:
+            if self.max_entries and len(fresh) >= self.max_entries:
+                complete = False
+                break
+            fresh[record.qr_code_id] = record
+
+        with self._lock:
+            self._records = fresh
+            self.complete = complete
+
+    def get(self, qr_code_id: str) -> Optional[MemberRecord]:
+        """Look up a member, counting the hit or miss"""
+        record = self._records.get(qr_code_id)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def put(self, record: MemberRecord):
+        """Add or replace a member, evicting the oldest entry when full"""
+        with self._lock:
+            if (self.max_entries and record.qr_code_id not in self._records
+                    and len(self._records) >= self.max_entries):
+                oldest = next(iter(self._records))
+                del self._records[oldest]
+                self.evictions += 1
+                self.complete = False
+            self._records[record.qr_code_id] = record
+
+    def put_many(self, records: Iterable[MemberRecord]):
+        """Add a batch of members (e.g. after an upload)"""
+        for record in records:
+            self.put(record)
+
+    def discard(self, qr_code_id: str):
+        """Remove a member, e.g. after deactivation"""
+        with self._lock:
+            self._records.pop(qr_code_id, None)
+
+    def invalidate(self):
+        """Drop everything; lookups fall back to the database until reloaded"""
+        with self._lock:
+            self._records = {}
+            self.complete = False
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get_metrics(self) -> Dict:
+        """Get cache size and hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._records),
+            "maxEntries": self.max_entries,
+            "complete": self.complete,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,199 @@
+"""
+Bulk import of member rows from uploaded spreadsheets
+Streams Excel/CSV rows in fixed-size chunks, normalizes them with pandas
+and inserts members in chunked transactions
+"""
+
+import os
+import zipfile
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import Database
+
+if TYPE_CHECKING:
+    # pandas takes longer to import than the rest of the app together, so it
+    # is imported on the first upload rather than at startup
+    import pandas as pd
+
+REQUIRED_COLUMNS = {'Name', 'QR Code ID'}
+
+# Spreadsheet column -> members table column, in add_members_bulk tuple order
+MEMBER_COLUMNS = [
+    ('QR Code ID', 'qr_code_id'),
+    ('Name', 'name'),
+    ('Designation', 'designation'),
+    ('Constituency', 'constituency'),
+    ('Constituency Number', 'constituency_number'),
+    ('Mobile Number', 'mobile_number'),
+]
+
+DEFAULT_CHUNK_SIZE = 5000
+
+EXCEL_EXTENSIONS = {'.xlsx', '.xlsm'}
+CSV_EXTENSIONS = {'.csv'}
+
+
+class UnsupportedFileError(ValueError):
+    """Raised for upload files that cannot be parsed as a member list"""
+
+
+def read_member_chunks(fileobj: BinaryIO, filename: str,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator["pd.DataFrame"]:
+    """
+    Parse an uploaded file into DataFrames of at most chunk_size rows
+    The first chunk is yielded even when the file has no data rows, so
+    callers can check the columns; a file without a header row raises
+    UnsupportedFileError on the first next(). Chunk indexes count data
+    rows from 0.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    fileobj.seek(0)
+    if extension in EXCEL_EXTENSIONS:
+        return _read_excel_chunks(fileobj, chunk_size)
+    if extension in CSV_EXTENSIONS:
+        return _read_csv_chunks(fileobj, chunk_size)
+    raise UnsupportedFileError(
+        f"Unsupported file type '{extension}'. Upload an .xlsx or .csv file"
+    )
+
+
+def _read_excel_chunks(fileobj: BinaryIO, chunk_size: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    # Read-only mode streams rows from the zipped sheet XML instead of
+    # building the whole workbook in memory
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except zipfile.BadZipFile:
+        raise UnsupportedFileError("The file is not a valid .xlsx workbook")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(value).strip() if value is not None else f"Unnamed: {i}"
+                   for i, value in enumerate(header)]
+
+        chunk: List[tuple] = []
+        index: List[int] = []
+        yielded = False
+        for row_number, row in enumerate(rows):
+            if all(value is None for value in row):
+                continue
+            row = tuple(_cell_text(value) for value in row[:len(columns)])
+            chunk.append(row + (None,) * (len(columns) - len(row)))
+            index.append(row_number)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=index, dtype=object)
+                yielded = True
+                chunk, index = [], []
+
+        if chunk or not yielded:
+            yield pd.DataFrame(chunk, columns=columns, index=index, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _cell_text(value):
+    """
+    Excel cell value as the text the CSV reader would give for it
+    Numeric cells come back as int or float; 1001.0 is written as "1001" so
+    QR codes and mobile numbers match whichever format they were uploaded in
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _read_csv_chunks(fileobj: BinaryIO, chunk_size: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+
+    # dtype=str keeps QR codes and mobile numbers exactly as written
+    try:
+        reader = pd.read_csv(fileobj, chunksize=chunk_size, dtype=str,
+                             encoding='utf-8-sig', skip_blank_lines=True)
+    except pd.errors.EmptyDataError:
+        raise UnsupportedFileError("The file is empty. Upload a sheet with a header row")
+    with reader:
+        yield from reader
+
+
+def normalize_members(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Map spreadsheet columns to stripped string member fields"""
+    import pandas as pd
+
+    normalized = pd.DataFrame(index=df.index)
+    for column, field in MEMBER_COLUMNS:
+        if column in df.columns:
+            normalized[field] = df[column].fillna('').astype(str).str.strip()
+        else:
+            normalized[field] = ''
+    return normalized
+
+
+def import_member_chunks(db: Database, chunks: Iterable["pd.DataFrame"],
+                         gateway_id: str, batch_id: str,
+                         progress: Optional[Callable[[int, int, int], None]] = None) -> Dict:
+    """
+    Import members chunk by chunk so memory stays bounded by the chunk size
+    progress, if given, is called with (total, successful, failed) after each chunk
+    Returns: {"total", "successful", "failed", "errors"}
+    """
+    total = 0
+    successful = 0
+    errors: List[Tuple[int, str]] = []
+
+    for chunk in chunks:
+        total += len(chunk)
+        added, chunk_errors = _import_chunk(db, chunk, gateway_id, batch_id)
+        successful += added
+        errors.extend(chunk_errors)
+        if progress:
+            progress(total, successful, len(errors))
+
+    errors.sort(key=lambda error: error[0])
+    return {
+        "total": total,
+        "successful": successful,
+        "failed": len(errors),
+        "errors": [f"Row {row}: {message}" for row, message in errors]
+    }
+
+
+def _import_chunk(db: Database, df: "pd.DataFrame", gateway_id: str,
+                  batch_id: str) -> Tuple[int, List[Tuple[int, str]]]:
+    """Validate and insert one chunk; returns (added, [(row, error)])"""
+    members = normalize_members(df)
+    errors: List[Tuple[int, str]] = []
+
+    missing = (members['qr_code_id'] == '') | (members['name'] == '')
+    for idx in members.index[missing]:
+        errors.append((idx + 2, "Missing QR Code ID or Name"))
+    members = members[~missing]
+
+    # Repeats within the chunk and QR codes already in the database
+    # (including earlier chunks of this file) are rejected the same way a
+    # failed INSERT would be
+    in_chunk = members['qr_code_id'].duplicated(keep='first')
+    existing = db.find_existing_qr_codes(members['qr_code_id'].unique().tolist())
+    duplicate = in_chunk | members['qr_code_id'].isin(existing)
+    for idx, qr_code_id in members.loc[duplicate, 'qr_code_id'].items():
+        errors.append((idx + 2, f"Member with QR Code ID {qr_code_id} already exists"))
+    members = members[~duplicate]
+
+    if members.empty:
+        return 0, errors
+
+    fields = [field for _, field in MEMBER_COLUMNS]
+    added, failures = db.add_members_bulk(
+        list(members[fields].itertuples(index=False, name=None)),
+        gateway_id=gateway_id,
+        upload_batch_id=batch_id
+    )
+    if failures:
+        for idx, qr_code_id in members['qr_code_id'].items():
+            if qr_code_id in failures:
+                errors.append((idx + 2, failures[qr_code_id]))
+
+    return added, errors
@@ -0,0 +1,269 @@
+"""
+Request and database metrics in the Prometheus text format
+MetricsRegistry holds counters, histograms and callback gauges and renders
+them for /api/metrics. RequestMetricsMiddleware times every HTTP request by
+route; QueryMetrics, fed by InstrumentedConnection, times every SQL statement
+and optionally logs slow ones.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements are labelled by their normalized SQL, cut to this length
+STATEMENT_LABEL_LENGTH = 160
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # per-bucket counts (last is +Inf), sum, count
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, labels, f'le="{le}"'), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), count
+
+
+class CallbackMetric(_Metric):
+    """Reads its values when rendered, for stats kept elsewhere (pool, caches)"""
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Dict[Tuple, float]],
+                 labelnames: Tuple[str, ...] = (), kind: str = "gauge"):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name: str, help_text: str, callback: Callable,
+                 labelnames: Tuple[str, ...] = (), kind: str = "gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, callback, labelnames, kind))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording request latency by method, route and status"""
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template so path parameters do not add series
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.histogram.observe(time.perf_counter() - started,
+                                   scope["method"], path, str(status["code"]))
+
+
+@lru_cache(maxsize=2048)
+def statement_label(sql: str) -> str:
+    """Normalize SQL into a metric label; IN (?, ?, ...) lists collapse to (?)"""
+    text = _PLACEHOLDER_LIST.sub("(?)", " ".join(sql.split()))
+    return text[:STATEMENT_LABEL_LENGTH]
+
+
+class QueryMetrics:
+    def __init__(self, registry: MetricsRegistry, slow_query_ms: float = 0):
+        self.query_seconds = registry.histogram(
+            "qr_db_query_seconds", "SQL statement execution time", ("statement",))
+        self.query_rows = registry.counter(
+            "qr_db_query_rows_total", "Rows returned or changed by SQL statements", ("statement",))
+        self.lock_wait_seconds = registry.histogram(
+            "qr_db_write_lock_wait_seconds", "Time writers spent waiting for the database write lock")
+        self.slow_queries = registry.counter(
+            "qr_db_slow_queries_total", "Statements slower than the slow query threshold")
+        self.connections_opened = registry.counter(
+            "qr_db_connections_opened_total", "SQLite connections opened")
+        self.slow_query_ms = slow_query_ms
+
+    def observe(self, sql: str, seconds: float, rowcount: int = -1) -> str:
+        """Record one statement; returns its label"""
+        label = statement_label(sql)
+        self.query_seconds.observe(seconds, label)
+        if rowcount > 0:
+            self.query_rows.inc(label, amount=rowcount)
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.inc()
+            print(f"Slow query ({seconds * 1000:.1f} ms): {' '.join(sql.split())}")
+        return label
+
+    def observe_write_lock(self, seconds: float):
+        """Record one wait for Database.write_lock; writers queue there, so the
+        BEGIN IMMEDIATE that follows finds SQLite's lock free"""
+        self.lock_wait_seconds.observe(seconds)
+
+    def add_rows(self, label: str, rows: int):
+        if rows > 0:
+            self.query_rows.inc(label, amount=rows)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor reporting statement times and row counts to its connection's QueryMetrics.
+    Times cover executing the statement (for SELECTs, up to the first row); rows
+    are those changed by writes or returned by fetchmany() and fetchall()."""
+    _label = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._label = self.connection.query_metrics.observe(
+                sql, time.perf_counter() - started, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._label = self.connection.query_metrics.observe(
+                sql, time.perf_counter() - started, self.rowcount)
+
+    def fetchmany(self, size: int = None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._label:
+            self.connection.query_metrics.add_rows(self._label, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._label:
+            self.connection.query_metrics.add_rows(self._label, len(rows))
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are InstrumentedCursors; set query_metrics
+    right after connecting"""
+    query_metrics: QueryMetrics
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute does not go through cursor(), so route it explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,275 @@
+"""
+Sampling profiler for live incidents
+While a profile runs, a background thread samples the Python stack of every
+other thread (sys._current_frames) at a fixed interval. Samples are written
+as collapsed stacks (one "frame;frame;frame count" line per stack, the input
+format of flamegraph.pl and speedscope) plus a summary of where time went:
+main.py handlers, database.py queries or pandas/openpyxl.
+
+Profiles are requested through system_config, so every uvicorn worker
+sharing the database picks the request up within WATCH_INTERVAL seconds and
+writes its own files into the shared profile directory.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+MAX_PROFILE_SECONDS = 300
+# How often workers check for a new profile request
+WATCH_INTERVAL = 1.0
+# Profiles kept in the profile directory
+KEEP_PROFILES = 20
+
+# Time is attributed to the frame nearest the top of the stack that matches
+# one of these (checked in order for each frame)
+CATEGORIES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("pandas/openpyxl", (f"{os.sep}pandas{os.sep}", f"{os.sep}openpyxl{os.sep}",
+                         f"{os.sep}pyarrow{os.sep}", f"{os.sep}numpy{os.sep}")),
+    ("database.py queries", (f"{os.sep}database.py",)),
+    ("main.py handlers", (f"{os.sep}main.py",)),
+]
+
+# Leaf frames of threads blocked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+_THREAD_NUMBER = re.compile(r"[_-]?\d+$")
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _category(stack: List) -> str:
+    """stack is leaf first"""
+    leaf = stack[0]
+    if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES:
+        return "idle"
+    for code in stack:
+        for name, patterns in CATEGORIES:
+            if any(pattern in code.co_filename for pattern in patterns):
+                return name
+    return "other"
+
+
+class _Sampler:
+    def __init__(self, profile_id: str, seconds: float, interval: float):
+        self.profile_id = profile_id
+        self.deadline = time.monotonic() + seconds
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.self_samples: Counter = Counter()
+        self.total_samples: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.samples = 0
+
+    def run(self, stop: threading.Event):
+        own_id = threading.get_ident()
+        while not stop.is_set() and time.monotonic() < self.deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._record(names.get(thread_id, "thread"), frame)
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def _record(self, thread_name: str, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+
+        category = _category(stack)
+        self.categories[category] += 1
+        if category == "idle":
+            return
+
+        labels = [_frame_label(code) for code in stack]
+        # Pool threads (db_0, db_1, ...) share one root in the flame graph
+        root = _THREAD_NUMBER.sub("", thread_name) or thread_name
+        self.stacks[";".join([root] + labels[::-1])] += 1
+        self.self_samples[labels[0]] += 1
+        for label in set(labels):
+            self.total_samples[label] += 1
+
+
+class ProfilerManager:
+    def __init__(self, db, profile_dir: str):
+        self.db = db
+        self.profile_dir = profile_dir
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._sampler_thread: Optional[threading.Thread] = None
+        self._seen: Optional[str] = None
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def start_watcher(self):
+        """Start watching system_config for profile requests"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="profile-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stop watching and cut any running profile short"""
+        self._stop.set()
+        for thread in (self._watcher, self._sampler_thread):
+            if thread:
+                thread.join(timeout=5)
+
+    def request(self, seconds: float, interval_ms: float = DEFAULT_SAMPLE_INTERVAL_MS) -> Dict:
+        """
+        Ask every worker to profile for `seconds`; this worker starts at once
+        Returns: the profile request; raises RuntimeError if one is running
+        """
+        current = self._current_request()
+        if current and current['until'] > time.time():
+            raise RuntimeError(f"Profile {current['profileId']} is still running")
+
+        profile = {
+            "profileId": time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6],
+            "seconds": seconds,
+            "intervalMs": interval_ms,
+            "until": time.time() + seconds
+        }
+        self._remove_old_profiles()
+        self.db.set_system_config('profiler_request', json.dumps(profile))
+        self._start_sampler(profile)
+        return profile
+
+    def _current_request(self) -> Optional[Dict]:
+        raw = self.db.get_system_config('profiler_request')
+        return json.loads(raw) if raw else None
+
+    def _watch(self):
+        while not self._stop.wait(WATCH_INTERVAL):
+            try:
+                profile = self._current_request()
+                if profile and profile['until'] > time.time():
+                    self._start_sampler(profile)
+            except Exception as e:
+                print(f"Error checking for profile requests: {e}")
+
+    def _start_sampler(self, profile: Dict):
+        with self._lock:
+            if self._seen == profile['profileId']:
+                return
+            self._seen = profile['profileId']
+            sampler = _Sampler(profile['profileId'], profile['until'] - time.time(),
+                               profile['intervalMs'] / 1000)
+            self._sampler_thread = threading.Thread(target=self._run_sampler, args=(sampler,),
+                                                    name="profiler", daemon=True)
+            self._sampler_thread.start()
+
+    def _run_sampler(self, sampler: _Sampler):
+        try:
+            sampler.run(self._stop)
+            self._write(sampler)
+        except Exception as e:
+            print(f"Error running profiler: {e}")
+
+    def _path(self, profile_id: str, pid: int, suffix: str) -> str:
+        return os.path.join(self.profile_dir, f"{profile_id}.{pid}.{suffix}")
+
+    def _write(self, sampler: _Sampler):
+        pid = os.getpid()
+        with open(self._path(sampler.profile_id, pid, "collapsed"), "w") as fileobj:
+            for stack, count in sampler.stacks.most_common():
+                fileobj.write(f"{stack} {count}\n")
+        with open(self._path(sampler.profile_id, pid, "json"), "w") as fileobj:
+            json.dump({
+                "pid": pid,
+                "samples": sampler.samples,
+                "categories": dict(sampler.categories),
+                "self": dict(sampler.self_samples),
+                "total": dict(sampler.total_samples)
+            }, fileobj)
+
+    def _files(self, profile_id: str, suffix: str) -> List[str]:
+        prefix = f"{profile_id}."
+        return sorted(
+            os.path.join(self.profile_dir, name) for name in os.listdir(self.profile_dir)
+            if name.startswith(prefix) and name.endswith("." + suffix)
+        )
+
+    def _remove_old_profiles(self):
+        profile_ids = sorted({name.split(".")[0] for name in os.listdir(self.profile_dir)})
+        for profile_id in profile_ids[:-KEEP_PROFILES + 1]:
+            for name in os.listdir(self.profile_dir):
+                if name.startswith(profile_id + "."):
+                    os.remove(os.path.join(self.profile_dir, name))
+
+    def get_collapsed(self, profile_id: str) -> Optional[str]:
+        """Merged collapsed stacks from every worker, or None if there are none yet"""
+        files = self._files(profile_id, "collapsed")
+        if not files:
+            return None
+        stacks: Counter = Counter()
+        for path in files:
+            with open(path) as fileobj:
+                for line in fileobj:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    stacks[stack] += int(count)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def get_summary(self, profile_id: str, top: int = 30) -> Optional[Dict]:
+        """
+        Time per category and the busiest functions, merged across workers
+        Returns: None for unknown profiles
+        """
+        current = self._current_request()
+        running = bool(current and current['profileId'] == profile_id and current['until'] > time.time())
+        files = self._files(profile_id, "json")
+        if not files and not running:
+            return None
+
+        workers, samples = [], 0
+        categories: Counter = Counter()
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for path in files:
+            with open(path) as fileobj:
+                data = json.load(fileobj)
+            workers.append(data['pid'])
+            samples += data['samples']
+            categories.update(data['categories'])
+            self_samples.update(data['self'])
+            total_samples.update(data['total'])
+
+        # Percentages are of samples where a thread was doing work
+        busy = sum(count for name, count in categories.items() if name != "idle")
+
+        def percent(count: int) -> float:
+            return round(count * 100 / busy, 1) if busy else 0.0
+
+        return {
+            "profileId": profile_id,
+            "status": "running" if running else "complete",
+            "workers": workers,
+            "samples": samples,
+            "busySamples": busy,
+            "categories": {
+                name: {"samples": categories.get(name, 0), "percent": percent(categories.get(name, 0))}
+                for name in [name for name, _ in CATEGORIES] + ["other"]
+            },
+            "idleSamples": categories.get("idle", 0),
+            "functions": [
+                {"function": function, "selfSamples": count, "selfPercent": percent(count),
+                 "totalSamples": total_samples[function], "totalPercent": percent(total_samples[function])}
+                for function, count in self_samples.most_common(top)
+            ]
+        }
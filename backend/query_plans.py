@@ -0,0 +1,262 @@
+"""
+Query plan check for the hot paths
+Runs each hot Database operation against a scratch database, captures the SQL
+it executes and checks EXPLAIN QUERY PLAN for full table scans and temporary
+B-trees. Exits nonzero if any hot statement falls back to one, unless its
+path is listed in ACCEPTED_PATHS, so it can run after schema or query
+changes (tests/test_query_plans.py runs the same check under pytest):
+
+    python query_plans.py [--members 2000] [--verbose]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from archive import archive_closed_days
+from database import Database, MEMBER_SORT_COLUMNS
+
+# Tables small enough that scanning them is expected
+SMALL_TABLES = {"gateways", "system_config", "sync_sequence", "version_history"}
+
+# Statements worth planning; transaction control and PRAGMAs are skipped
+PLANNED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+_SMALL_FILTERED_SET = ("sorts one constituency's members; an index per filter and "
+                       "sort order would slow every upload")
+
+# Hot paths whose full scans or sorts are expected, with the reason
+ACCEPTED_PATHS: Dict[str, str] = {
+    "warm member cache": "reads every active member once at startup",
+    "snapshot source": "the snapshot holds every active member",
+    "upload history": "returns every upload batch, in index order",
+    **{f"members page by constituency by {sort}": _SMALL_FILTERED_SET
+       for sort in MEMBER_SORT_COLUMNS if sort != "created_at"},
+    "members page by constituency and designation by name": _SMALL_FILTERED_SET,
+}
+
+
+def _seed(db: Database, count: int) -> List[str]:
+    members = [
+        (f"QR{n:08d}", f"Member {n}", f"Designation {n % 6}", f"Constituency {n % 50}",
+         str(n % 50), f"9{n:09d}")
+        for n in range(count)
+    ]
+    db.add_members_bulk(members, gateway_id="GATEWAY-001")
+    db.register_gateway("GATEWAY-002", "Second Gateway")
+
+    # A closed day of scans, archived, so replays read through scan_history_all
+    with db.get_connection() as conn:
+        conn.execute("UPDATE members SET upload_date = '2020-01-01 00:00:00'")
+        conn.commit()
+    db.member_cache.invalidate()
+    yesterday = datetime.now() - timedelta(days=1)
+    db.process_scan_batch("GATEWAY-001", [(member[0], yesterday) for member in members[:count // 4]])
+    archive_closed_days(db, hot_days=1)
+
+    with db.get_connection() as conn:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return [member[0] for member in members]
+
+
+def hot_paths(db: Database, qr_codes: List[str]) -> List[Tuple[str, Callable]]:
+    """Named operations whose statements must use indexes"""
+    first, second, third = qr_codes[0], qr_codes[1], qr_codes[2]
+    replay_time = datetime.now() - timedelta(days=1)
+    paths = [
+        ("member lookup", lambda: db.get_member_by_qr(first)),
+        ("validate scan", lambda: db.validate_scan(first, "GATEWAY-001")),
+        ("scan (no ledger)", lambda: db.process_scan(first, "GATEWAY-001")),
+        ("duplicate scan (no ledger)", lambda: db.process_scan(first, "GATEWAY-002")),
+        ("load scan ledger", db.load_scan_ledger),
+        ("scan", lambda: db.process_scan(second, "GATEWAY-001")),
+        ("scan batch", lambda: db.process_scan_batch(
+            "GATEWAY-002", [(third, datetime.now()), (qr_codes[3], replay_time)], pending_uploads=0)),
+        ("queued scan write", lambda: db.write_scans([{
+            "uid": "plan-0001", "qrCodeId": qr_codes[4], "memberId": db.get_member_by_qr(qr_codes[4])['id'],
+            "gatewayId": "GATEWAY-001", "valid": True, "message": "Valid scan",
+            "scanDate": datetime.now().date().isoformat(), "scannedAt": db._utc_timestamp()
+        }])),
+        ("journal replay", lambda: db.write_scans([{
+            "uid": "plan-0001", "qrCodeId": qr_codes[4], "memberId": 0, "gatewayId": "GATEWAY-001",
+            "valid": True, "message": "Valid scan", "scanDate": "", "scannedAt": ""
+        }], skip_existing=True)),
+        ("member scan count", lambda: db.get_scan_count(1)),
+        ("stats summary", lambda: db.get_stats_summary()),
+        ("gateway stats summary", lambda: db.get_stats_summary("GATEWAY-001")),
+        ("stats", lambda: db.get_stats()),
+        ("gateway stats", lambda: db.get_stats("GATEWAY-001")),
+        ("add member", lambda: db.add_member("QRPLAN0001", "Plan Member")),
+        ("member sync", lambda: db.sync_member_changes("GATEWAY-002", 0, 100)),
+        ("existing QR codes", lambda: db.find_existing_qr_codes(qr_codes[:600] + ["QRMISSING"])),
+        ("cache members", lambda: db.cache_members(1, 100)),
+        ("warm member cache", db.warm_member_cache),
+        ("snapshot source", lambda: db.get_snapshot_source(datetime.now().date())),
+        ("upload batch", lambda: _upload_batch(db)),
+        ("upload history", lambda: db.get_upload_history()),
+        ("gateway upload history", lambda: db.get_upload_history("GATEWAY-001")),
+        ("fail interrupted uploads", lambda: db.fail_interrupted_upload_batches(["worker-1"])),
+    ]
+
+    today = datetime.now().date().isoformat()
+    last_week = (datetime.now() - timedelta(days=7)).date().isoformat()
+    for name, filters in (
+        ("export", {}),
+        ("gateway export", {"gateway_id": "GATEWAY-001"}),
+        ("export by upload date", {"uploaded_from": last_week, "uploaded_before": today}),
+        ("gateway export by upload date", {"gateway_id": "GATEWAY-001",
+                                           "uploaded_from": last_week, "uploaded_before": today}),
+    ):
+        paths.append((name, lambda f=filters: _first_batch(db.iter_member_export(**f))))
+
+    for sort in MEMBER_SORT_COLUMNS:
+        for order in ("asc", "desc"):
+            paths.append((f"members page by {sort} {order}", lambda s=sort, o=order: _two_pages(db, sort=s, order=o)))
+    paths += [
+        ("members page by gateway", lambda: _two_pages(db, gateway_id="GATEWAY-001")),
+        ("members page by constituency", lambda: _two_pages(db, constituency="Constituency 7")),
+        ("members page by designation", lambda: _two_pages(db, designation="Designation 2")),
+        ("members page scanned today", lambda: _two_pages(db, scanned=True)),
+        ("members page not scanned today", lambda: _two_pages(db, scanned=False)),
+        ("members page by constituency and designation",
+         lambda: _two_pages(db, constituency="Constituency 7", designation="Designation 2")),
+        ("members page by constituency and designation by name",
+         lambda: _two_pages(db, constituency="Constituency 7", designation="Designation 2", sort="name")),
+    ]
+    for sort in MEMBER_SORT_COLUMNS:
+        paths.append((f"members page by constituency by {sort}",
+                      lambda s=sort: _two_pages(db, constituency="Constituency 7", sort=s)))
+        paths.append((f"members page by gateway and designation by {sort}",
+                      lambda s=sort: _two_pages(db, gateway_id="GATEWAY-001", designation="Designation 2", sort=s)))
+    return paths
+
+
+def _first_batch(batches):
+    next(batches, None)
+    batches.close()
+
+
+def _upload_batch(db: Database):
+    batch_id = db.create_upload_batch("GATEWAY-001", "plan.csv", status="queued")
+    db.update_upload_batch(batch_id, 10, 9, 1, status="processing")
+    db.get_upload_batch(batch_id)
+
+
+def _two_pages(db: Database, **filters):
+    page = db.get_members_page(limit=20, **filters)
+    if page['nextCursor']:
+        db.get_members_page(limit=20, cursor_token=page['nextCursor'], **filters)
+
+
+def plan_problems(conn: sqlite3.Connection, sql: str) -> Tuple[List[str], List[str]]:
+    """
+    EXPLAIN a statement
+    Returns: (plan lines, problem lines)
+    """
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN "):
+            name = detail.split()[1]
+            if name not in SMALL_TABLES and name != "CONSTANT":
+                problems.append(detail)
+        elif "TEMP B-TREE" in detail:
+            problems.append(detail)
+    return plan, problems
+
+
+def run_checks(members: int = 2000) -> List[Dict]:
+    """
+    Plan every statement of each hot path against a scratch database
+    Returns: [{"name", "statements", "problems": [(sql, plan)], "accepted": reason or None}]
+    """
+    work_dir = tempfile.mkdtemp(prefix="qr_plans_")
+    db_path = os.path.join(work_dir, "plans.db")
+    db = Database(db_path)
+    captured: List[str] = []
+
+    # Trace every pooled connection opened from here on
+    configure = db.pool.on_connect
+
+    def traced(conn: sqlite3.Connection):
+        configure(conn)
+        conn.set_trace_callback(captured.append)
+
+    try:
+        qr_codes = _seed(db, members)
+        db.pool.on_connect = traced
+        db.pool.recycle()
+
+        statements: Dict[str, List[str]] = {}
+        for name, operation in hot_paths(db, qr_codes):
+            captured.clear()
+            operation()
+            statements[name] = list(dict.fromkeys(
+                sql.strip() for sql in captured
+                if sql.lstrip().split(None, 1)[0].upper() in PLANNED_STATEMENTS
+            ))
+        db.pool.on_connect = configure
+        db.pool.recycle()
+
+        results = []
+        with db.get_connection() as conn:
+            for name, sqls in statements.items():
+                problems = []
+                plans = []
+                for sql in sqls:
+                    plan, sql_problems = plan_problems(conn, sql)
+                    plans.append(plan)
+                    if sql_problems:
+                        problems.append((sql, plan))
+                results.append({
+                    "name": name,
+                    "statements": list(zip(sqls, plans)),
+                    "problems": problems,
+                    "accepted": ACCEPTED_PATHS.get(name)
+                })
+    finally:
+        db.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def check(members: int = 2000, verbose: bool = False) -> int:
+    results = run_checks(members)
+    failures = 0
+    for result in results:
+        name, problems = result['name'], result['problems']
+        if problems and result['accepted']:
+            status = "ACCEPTED"
+        elif problems:
+            status = "FAIL"
+            failures += 1
+        else:
+            status = "ok"
+        print(f"{status:4} {name} ({len(result['statements'])} statements)")
+        if problems and result['accepted']:
+            print(f"     {result['accepted']}")
+        if problems and (verbose or not result['accepted']):
+            for sql, plan in problems:
+                print(f"     {' '.join(sql.split())[:200]}")
+                for detail in plan:
+                    print(f"       {detail}")
+        elif verbose:
+            for sql, plan in result['statements']:
+                print(f"  {name}: {' | '.join(plan)}")
+
+    print(f"{len(results) - failures}/{len(results)} hot paths use indexes only or are accepted")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--verbose", action="store_true", help="Print plans of passing statements")
+    args = parser.parse_args()
+    sys.exit(check(args.members, args.verbose))
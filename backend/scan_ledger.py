@@ -0,0 +1,90 @@
+"""
+Day-scoped ledger of members with a valid scan today
+Answers the duplicate scan check without querying scan_history
+"""
+
+import threading
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class ScanLedger:
+    def __init__(self):
+        # member_id -> (gateway_id, scanned_at) of the member's valid scan today
+        self._entries: Dict[int, Tuple[str, str]] = {}
+        # gateway_id -> members whose valid scan today was at that gateway
+        self._gateway_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Held from a duplicate check until its scan is recorded by every path
+        # that validates scans (process_scan, process_scan_batch and
+        # ScanWriter.submit), so two of them cannot both pass the same member
+        self.check_lock = threading.Lock()
+        self.scan_date: Optional[date] = None
+        self.loaded = False
+
+    def rebuild(self, scan_date: date, rows: Iterable[Tuple[int, str, str]]):
+        """Load today's valid scans as (member_id, gateway_id, scanned_at) rows"""
+        entries = {member_id: (gateway_id, scanned_at) for member_id, gateway_id, scanned_at in rows}
+        gateway_counts: Dict[str, int] = {}
+        for gateway_id, _ in entries.values():
+            gateway_counts[gateway_id] = gateway_counts.get(gateway_id, 0) + 1
+        with self._lock:
+            self._entries = entries
+            self._gateway_counts = gateway_counts
+            self.scan_date = scan_date
+            self.loaded = True
+
+    def _roll_over(self, today: date):
+        # A new day starts with nobody scanned; the ledger never moves backwards
+        if self.scan_date is None or today > self.scan_date:
+            self._entries = {}
+            self._gateway_counts = {}
+            self.scan_date = today
+
+    def is_ready(self, scan_date: date) -> bool:
+        """Whether the ledger can answer duplicate checks for the given day"""
+        if not self.loaded:
+            return False
+        if self.scan_date != scan_date:
+            with self._lock:
+                self._roll_over(scan_date)
+        return self.scan_date == scan_date
+
+    def get(self, member_id: int) -> Optional[Tuple[str, str]]:
+        """Get (gateway_id, scanned_at) of the member's valid scan today"""
+        return self._entries.get(member_id)
+
+    def record(self, scan_date: date, member_id: int, gateway_id: str, scanned_at: str):
+        """Mark a member as scanned on scan_date (ignored for past days)"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._roll_over(scan_date)
+            if self.scan_date == scan_date:
+                self._discount(self._entries.get(member_id))
+                self._entries[member_id] = (gateway_id, scanned_at)
+                self._gateway_counts[gateway_id] = self._gateway_counts.get(gateway_id, 0) + 1
+
+    def forget(self, member_id: int):
+        """Undo record() when the scan's transaction did not commit"""
+        with self._lock:
+            self._discount(self._entries.pop(member_id, None))
+
+    def _discount(self, entry: Optional[Tuple[str, str]]):
+        if entry:
+            self._gateway_counts[entry[0]] -= 1
+
+    def gateway_count(self, gateway_id: str) -> int:
+        """Members scanned today at a gateway (one valid scan per member per day)"""
+        return self._gateway_counts.get(gateway_id, 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_metrics(self) -> Dict:
+        """Get ledger state"""
+        return {
+            "loaded": self.loaded,
+            "scanDate": self.scan_date.isoformat() if self.scan_date else None,
+            "scannedMembers": len(self._entries)
+        }
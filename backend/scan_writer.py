@@ -0,0 +1,234 @@
+"""
+Write-behind queue for single scans with group commit
+Scans are validated against the member cache and scan ledger, queued, and
+committed by one writer thread in groups, so many scans share each commit
+(and its fsync). In "commit" mode a scan is acknowledged once its group has
+committed; in "early" mode once it is appended to a journal file, which is
+replayed at startup to record scans acknowledged before a crash.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SCAN_WRITE_MODES = {
+    "sync": "each scan is validated and committed in its own transaction",
+    "commit": "scans are group committed; responses wait for the commit",
+    "early": "scans are group committed; responses are sent once the scan is journaled"
+}
+DEFAULT_SCAN_WRITE_MODE = "commit"
+# A group is committed once it has this many scans or its first scan has
+# waited this long
+DEFAULT_GROUP_SIZE = 256
+DEFAULT_GROUP_DELAY_MS = 2.0
+# Pause before retrying a group that failed to commit in early mode
+RETRY_DELAY = 0.5
+
+
+class ScanWriter:
+    def __init__(self, db, journal_path: str, mode: str = DEFAULT_SCAN_WRITE_MODE,
+                 group_size: int = DEFAULT_GROUP_SIZE,
+                 group_delay_ms: float = DEFAULT_GROUP_DELAY_MS):
+        if mode not in SCAN_WRITE_MODES:
+            raise ValueError(f"Unknown scan write mode '{mode}'. Available: {', '.join(SCAN_WRITE_MODES)}")
+        self.db = db
+        self.journal_path = journal_path
+        self.mode = mode
+        self.group_size = group_size
+        self.group_delay = group_delay_ms / 1000
+
+        # Validation, the ledger update and queueing happen under the ledger's
+        # check lock, shared with process_scan and process_scan_batch, so two
+        # scans of the same member cannot both pass the check
+        self._accept_lock = db.scan_ledger.check_lock
+        self._queue: "queue.Queue[Tuple[Dict, Optional[Future]]]" = queue.Queue()
+        self._journal_fd: Optional[int] = None
+        self._journaled = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.groups = 0
+        self.committed = 0
+        self.largest_group = 0
+        self.failed_groups = 0
+
+    @property
+    def active(self) -> bool:
+        """Whether single scans go through the queue; other workers' scans reach
+        the ledger late, so multi-worker mode always validates in the database"""
+        return (self.mode != "sync" and self._thread is not None
+                and not self.db.multi_worker and self.db.scan_ledger.loaded)
+
+    def start(self):
+        """Replay the journal left by a previous run, then start the writer thread"""
+        replayed = self.replay_journal()
+        if replayed:
+            print(f"Recorded {replayed} journaled scans from the previous run")
+        self._journal_fd = os.open(self.journal_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Commit every queued scan and stop the writer thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
+
+    def submit(self, qr_code_id: str, gateway_id: str) -> Tuple[bool, str, Optional[Dict], int, Optional[Future]]:
+        """
+        Validate a scan and queue it for the writer
+        Returns: (is_valid, message, member_data, gateway_scanned_today, commit)
+        where commit is a Future resolved when the scan commits, or None when
+        there is nothing to wait for
+        """
+        if not self.active:
+            return self.db.process_scan(qr_code_id, gateway_id) + (None,)
+
+        member = self.db.get_member_by_qr(qr_code_id)
+        if not member:
+            return False, "Member not found in database", None, 0, None
+        # Counted before the lock; at most one valid scan per member per day
+        scan_count = self.db.get_scan_count(member['id'])
+
+        with self._accept_lock:
+            current_time = datetime.now()
+            today = current_time.date()
+            if self.db.scan_ledger.is_ready(today):
+                is_valid, message = self.db._check_scan_rules(None, member, gateway_id, current_time)
+                scan = {
+                    "uid": uuid.uuid4().hex,
+                    "qrCodeId": qr_code_id,
+                    "memberId": member['id'],
+                    "gatewayId": gateway_id,
+                    "valid": is_valid,
+                    "message": message,
+                    "scanDate": today.isoformat(),
+                    "scannedAt": self.db._utc_timestamp()
+                }
+                scanned_today = 0
+                if is_valid:
+                    self.db.scan_ledger.record(today, member['id'], gateway_id, scan['scannedAt'])
+                    scanned_today = self.db.scan_ledger.gateway_count(gateway_id)
+                    member['scan_count'] = scan_count + 1
+                    scan['event'] = self.db._scan_event(member, gateway_id, scan['scannedAt'],
+                                                        today, scanned_today)
+
+                commit = None
+                if self.mode == "early":
+                    self._append_journal(scan)
+                else:
+                    commit = Future()
+                self._queue.put((scan, commit))
+                return is_valid, message, member, scanned_today, commit
+
+        # The ledger holds a later day (the clock went back), so the duplicate
+        # check needs the database; process_scan takes the lock itself
+        return self.db.process_scan(qr_code_id, gateway_id) + (None,)
+
+    def _append_journal(self, scan: Dict):
+        # A write() survives the process crashing; power loss is covered only
+        # as far as the storage profile syncs the database itself
+        line = json.dumps({key: value for key, value in scan.items() if key != "event"}) + "\n"
+        os.write(self._journal_fd, line.encode())
+        self._journaled += 1
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+
+            group = [first]
+            deadline = time.monotonic() + self.group_delay
+            while len(group) < self.group_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    group.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit(group)
+            except Exception as e:
+                print(f"Error in scan writer: {e}")
+
+    def _commit(self, group: List[Tuple[Dict, Optional[Future]]]):
+        scans = [scan for scan, _ in group]
+        # Early mode scans were acknowledged when they were journaled
+        acknowledged = any(commit is None for _, commit in group)
+        while True:
+            try:
+                self.db.write_scans(scans)
+                break
+            except Exception as e:
+                self.failed_groups += 1
+                print(f"Error committing {len(scans)} queued scans: {e}")
+                if acknowledged and not self._stop.is_set():
+                    # Keep retrying; the journal still holds them if the
+                    # process dies meanwhile
+                    time.sleep(RETRY_DELAY)
+                    continue
+                for scan, commit in group:
+                    if scan['valid']:
+                        self.db.scan_ledger.forget(scan['memberId'])
+                    if commit:
+                        commit.set_exception(e)
+                return
+
+        self.groups += 1
+        self.committed += len(scans)
+        self.largest_group = max(self.largest_group, len(scans))
+        for scan, commit in group:
+            if commit:
+                commit.set_result(None)
+            if scan['valid']:
+                self.db.events.publish("scan", scan['event'])
+
+        with self._accept_lock:
+            # Everything journaled has committed once nothing is queued
+            if self._journaled and self._queue.empty():
+                os.ftruncate(self._journal_fd, 0)
+                self._journaled = 0
+
+    def replay_journal(self) -> int:
+        """Record journaled scans that did not commit before the last shutdown"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        scans = []
+        with open(self.journal_path) as fileobj:
+            for line in fileobj:
+                try:
+                    scans.append(json.loads(line))
+                except ValueError:
+                    # Partly written last line from a crash; it was never acknowledged
+                    continue
+        replayed = self.db.write_scans(scans, skip_existing=True) if scans else 0
+        os.truncate(self.journal_path, 0)
+        return replayed
+
+    def get_metrics(self) -> Dict:
+        """Get writer state and group commit counters"""
+        return {
+            "mode": self.mode,
+            "active": self.active,
+            "queued": self._queue.qsize(),
+            "groups": self.groups,
+            "committed": self.committed,
+            "averageGroupSize": round(self.committed / self.groups, 2) if self.groups else 0.0,
+            "largestGroup": self.largest_group,
+            "failedGroups": self.failed_groups
+        }
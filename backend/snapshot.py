@@ -0,0 +1,240 @@
+"""
+Validation snapshot for gateways
+A compact binary file with every active member and today's scanned set, so a
+gateway can validate scans locally and replay them later through
+/api/scan/batch. Built by build_snapshot(); read with SnapshotReader, which
+memory-maps the file and looks members up by binary search.
+
+Layout (little-endian):
+    header      HEADER struct, padded to HEADER_SIZE bytes
+    hashes      member_count x u64, sorted 64-bit hashes of the QR code IDs
+    offsets     member_count x u32, record offset (from records start) per hash
+    records     RECORD struct followed by the RECORD_STRINGS as UTF-8, NUL separated
+"""
+
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+from typing import BinaryIO, Dict, NamedTuple, Optional, Tuple, Union
+
+from database import Database
+
+MAGIC = b"QRSNAP01"
+FORMAT_VERSION = 1
+
+# magic, format version, member count, scanned count, data version,
+# created at (unix seconds), scan date (ordinal), index offset, records offset
+HEADER = struct.Struct("<8sIIIqqIQQ")
+HEADER_SIZE = 64
+
+RECORD_STRINGS = ("qr_code_id", "name", "designation", "constituency",
+                  "constituency_number", "mobile_number", "gateway_id", "scan_gateway_id")
+# member id, upload date (microseconds since 1970-01-01, local time),
+# today's valid scan time (microseconds since 1970-01-01, UTC; -1 if none),
+# byte length of the QR code ID, byte length of all strings
+RECORD = struct.Struct("<qqqHI")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SnapshotError(ValueError):
+    """Raised for files that are not readable validation snapshots"""
+
+
+class SnapshotMember(NamedTuple):
+    member_id: int
+    qr_code_id: str
+    name: str
+    designation: str
+    constituency: str
+    constituency_number: str
+    mobile_number: str
+    gateway_id: str
+    upload_date: datetime
+    scanned_gateway_id: Optional[str]
+    scanned_at: Optional[datetime]
+
+
+def qr_hash(qr_code_id: str) -> int:
+    """64-bit hash used to index QR code IDs"""
+    return int.from_bytes(hashlib.blake2b(qr_code_id.encode(), digest_size=8).digest(), "little")
+
+
+def _to_micros(value: str) -> int:
+    return (datetime.fromisoformat(value) - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _encode_record(row) -> bytes:
+    scanned_at = _to_micros(row['scanned_at']) if row['scanned_at'] else -1
+    strings = [(row[field] or "").replace("\0", "").encode() for field in RECORD_STRINGS]
+    joined = b"\0".join(strings)
+    return RECORD.pack(row['id'], _to_micros(row['upload_date']), scanned_at,
+                       len(strings[0]), len(joined)) + joined
+
+
+def build_snapshot(db: Database, fileobj: BinaryIO, scan_date: date = None) -> Dict:
+    """
+    Write a snapshot of active members and scan_date's (default today) valid scans
+    Returns: snapshot metadata
+    """
+    scan_date = scan_date or datetime.now().date()
+    data_version, rows = db.get_snapshot_source(scan_date)
+
+    entries = []
+    records = bytearray()
+    scanned = 0
+    for row in rows:
+        entries.append((qr_hash(row['qr_code_id']), len(records)))
+        records += _encode_record(row)
+        scanned += 1 if row['scanned_at'] else 0
+    entries.sort()
+
+    index_offset = HEADER_SIZE
+    records_offset = index_offset + len(entries) * 12
+    created_at = int(datetime.now().timestamp())
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), scanned, data_version,
+                         created_at, scan_date.toordinal(), index_offset, records_offset)
+
+    fileobj.write(header.ljust(HEADER_SIZE, b"\0"))
+    fileobj.write(array("Q", [entry[0] for entry in entries]).tobytes() if sys.byteorder == "little"
+                  else b"".join(struct.pack("<Q", entry[0]) for entry in entries))
+    fileobj.write(array("I", [entry[1] for entry in entries]).tobytes() if sys.byteorder == "little"
+                  else b"".join(struct.pack("<I", entry[1]) for entry in entries))
+    fileobj.write(records)
+
+    return {
+        "members": len(entries),
+        "scannedToday": scanned,
+        "dataVersion": data_version,
+        "scanDate": scan_date.isoformat(),
+        "bytes": records_offset + len(records)
+    }
+
+
+class SnapshotReader:
+    def __init__(self, source: Union[str, bytes]):
+        """Open a snapshot from a file path (memory-mapped) or from bytes"""
+        self._file = None
+        self._mmap = None
+        if isinstance(source, (bytes, bytearray)):
+            self._buffer = memoryview(source)
+        else:
+            self._file = open(source, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buffer = memoryview(self._mmap)
+
+        if len(self._buffer) < HEADER_SIZE:
+            raise SnapshotError("Snapshot is truncated")
+        (magic, version, self.member_count, self.scanned_count, self.data_version,
+         created_at, scan_date, index_offset, self._records_offset) = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError("Not a supported validation snapshot")
+
+        self.created_at = datetime.fromtimestamp(created_at)
+        self.scan_date = date.fromordinal(scan_date)
+
+        offsets_offset = index_offset + self.member_count * 8
+        if sys.byteorder == "little":
+            self._hashes = self._buffer[index_offset:offsets_offset].cast("Q")
+            self._offsets = self._buffer[offsets_offset:self._records_offset].cast("I")
+        else:
+            self._hashes = array("Q", self._buffer[index_offset:offsets_offset])
+            self._offsets = array("I", self._buffer[offsets_offset:self._records_offset])
+            self._hashes.byteswap()
+            self._offsets.byteswap()
+
+        # Scans accepted locally since the snapshot was built:
+        # qr_code_id -> (gateway_id, scanned_at in UTC, local scan date)
+        self._local_scans: Dict[str, Tuple[str, datetime, date]] = {}
+
+    def close(self):
+        # Views must be released before the map can be closed
+        for view in (self._hashes, self._offsets, self._buffer):
+            if isinstance(view, memoryview):
+                view.release()
+        if self._mmap:
+            self._mmap.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.member_count
+
+    def lookup(self, qr_code_id: str) -> Optional[SnapshotMember]:
+        """Find an active member by QR code ID"""
+        target = qr_hash(qr_code_id)
+        encoded = qr_code_id.encode()
+        i = bisect_left(self._hashes, target)
+        while i < self.member_count and self._hashes[i] == target:
+            position = self._records_offset + self._offsets[i]
+            fields = RECORD.unpack_from(self._buffer, position)
+            start = position + RECORD.size
+            # Compare the QR code before decoding the rest of the record
+            if self._buffer[start:start + fields[3]] == encoded:
+                return self._decode_record(fields, start)
+            i += 1
+        return None
+
+    def _decode_record(self, fields: tuple, start: int) -> SnapshotMember:
+        member_id, upload_micros, scanned_micros, _, strings_length = fields
+        (qr_code_id, name, designation, constituency, constituency_number, mobile_number,
+         gateway_id, scan_gateway_id) = str(self._buffer[start:start + strings_length], "utf-8").split("\0")
+        return SnapshotMember(
+            member_id, qr_code_id, name, designation, constituency, constituency_number,
+            mobile_number, gateway_id, _from_micros(upload_micros),
+            scan_gateway_id or None,
+            _from_micros(scanned_micros) if scanned_micros >= 0 else None
+        )
+
+    def validate(self, qr_code_id: str, gateway_id: str,
+                 current_time: datetime = None) -> Tuple[bool, str, Optional[SnapshotMember]]:
+        """
+        Apply the server's scan rules using the snapshot and local scans
+        Returns: (is_valid, message, member)
+        """
+        current_time = current_time or datetime.now()
+        member = self.lookup(qr_code_id)
+        if not member:
+            return False, "Member not found in database", None
+
+        if member.upload_date > current_time:
+            return False, "Invalid: Member data uploaded in future", member
+
+        # The snapshot's scanned set only applies on the day it was built
+        last_scan = None
+        local_scan = self._local_scans.get(qr_code_id)
+        if local_scan and local_scan[2] == current_time.date():
+            last_scan = local_scan[:2]
+        elif member.scanned_at and self.scan_date == current_time.date():
+            last_scan = (member.scanned_gateway_id, member.scanned_at)
+
+        if last_scan:
+            scanned_gateway, last_scan_time = last_scan
+            if scanned_gateway == gateway_id:
+                time_diff = (current_time - last_scan_time).total_seconds() / 60
+                remaining = int(60 - time_diff)
+                return False, f"Already scanned at this gate. Wait {remaining} more minutes", member
+            scan_time = last_scan_time.strftime("%I:%M %p")
+            return False, f"Already scanned today at {scanned_gateway} at {scan_time}", member
+
+        return True, "Valid scan", member
+
+    def mark_scanned(self, qr_code_id: str, gateway_id: str, current_time: datetime = None):
+        """Remember a locally accepted scan so later validations see it"""
+        current_time = current_time or datetime.now()
+        # Kept in UTC like scan_history.scanned_at so messages match the server
+        scanned_at = current_time.astimezone(timezone.utc).replace(tzinfo=None)
+        self._local_scans[qr_code_id] = (gateway_id, scanned_at, current_time.date())
@@ -0,0 +1,58 @@
+"""
+Spreadsheet parsing (see member_import.py): Excel and CSV uploads of the
+same sheet must give the same member values in every chunk
+"""
+
+import io
+
+from openpyxl import Workbook
+
+from member_import import normalize_members, read_member_chunks
+
+HEADER = ['QR Code ID', 'Name', 'Mobile Number']
+ROWS = [
+    [1001, 'Asha', 9876543210],
+    [1002, 'Ravi', None],
+    [1003, 'Meena', 9876543212.0],
+    [1004, 'Kiran', 9876543213],
+]
+
+
+def _xlsx(rows) -> io.BytesIO:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    fileobj = io.BytesIO()
+    workbook.save(fileobj)
+    fileobj.seek(0)
+    return fileobj
+
+
+def _csv(rows) -> io.BytesIO:
+    def text(value):
+        if value is None:
+            return ''
+        return str(int(value)) if isinstance(value, float) else str(value)
+
+    lines = [','.join(HEADER)] + [','.join(text(value) for value in row) for row in rows]
+    return io.BytesIO(('\n'.join(lines) + '\n').encode())
+
+
+def _members(fileobj, filename):
+    chunks = read_member_chunks(fileobj, filename, chunk_size=2)
+    return [normalize_members(chunk).to_dict('records') for chunk in chunks]
+
+
+def test_excel_numbers_match_in_chunks_with_blank_cells():
+    # The first chunk has a blank mobile number, the second has none
+    chunks = _members(_xlsx(ROWS), 'members.xlsx')
+    assert [[member['qr_code_id'] for member in chunk] for chunk in chunks] == [['1001', '1002'], ['1003', '1004']]
+    assert [[member['mobile_number'] for member in chunk] for chunk in chunks] == [
+        ['9876543210', ''], ['9876543212', '9876543213']
+    ]
+
+
+def test_excel_and_csv_give_the_same_members():
+    assert _members(_xlsx(ROWS), 'members.xlsx') == _members(_csv(ROWS), 'members.csv')
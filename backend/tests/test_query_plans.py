@@ -0,0 +1,28 @@
+"""
+Hot path query plans (see query_plans.py): every statement must use indexes
+only, unless its path is listed in ACCEPTED_PATHS
+"""
+
+import pytest
+
+from query_plans import ACCEPTED_PATHS, run_checks
+
+
+@pytest.fixture(scope="module")
+def results():
+    return run_checks(members=2000)
+
+
+def test_hot_paths_use_indexes(results):
+    failures = []
+    for result in results:
+        if result['problems'] and not result['accepted']:
+            for sql, plan in result['problems']:
+                failures.append(f"{result['name']}: {' '.join(sql.split())}\n    " + "\n    ".join(plan))
+    assert not failures, "Hot paths with full scans or temp B-trees:\n" + "\n".join(failures)
+
+
+def test_accepted_paths_are_checked(results):
+    # A renamed or removed path must not leave a stale exemption behind
+    assert set(ACCEPTED_PATHS) <= {result['name'] for result in results}
+
@@ -0,0 +1,147 @@
+"""
+Background upload jobs
+Runs member imports on a worker thread so uploads do not block scanning
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, List, Optional
+
+from database import Database
+from member_import import import_member_chunks
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Finished jobs kept in memory for status polling; older ones are served
+# from the upload_batches table
+MAX_FINISHED_JOBS = 100
+
+
+class UploadJob:
+    def __init__(self, batch_id: str, gateway_id: str, file_name: str):
+        self.batch_id = batch_id
+        self.gateway_id = gateway_id
+        self.file_name = file_name
+        self.status = "queued"
+        self.total = 0
+        self.successful = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.error: Optional[str] = None
+        self.queued_at = datetime.now()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        """Format job progress for the status endpoint"""
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "batchId": self.batch_id,
+            "gatewayId": self.gateway_id,
+            "fileName": self.file_name,
+            "status": self.status,
+            "rowsProcessed": self.total,
+            "total": self.total,
+            "successful": self.successful,
+            "failed": self.failed,
+            "errors": self.errors[:10],
+            "error": self.error,
+            "queuedAt": self.queued_at.isoformat(),
+            "elapsedSeconds": round(elapsed, 3),
+            "rowsPerSecond": round(self.total / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+class UploadJobManager:
+    def __init__(self, db: Database, max_workers: int = 1):
+        self.db = db
+        # One worker by default: SQLite has a single writer, so parallel
+        # imports would only queue on the write lock
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+        self.jobs: Dict[str, UploadJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, batch_id: str, gateway_id: str, file_name: str,
+               chunks: Iterable["pd.DataFrame"], fileobj: BinaryIO) -> UploadJob:
+        """Queue an import of parsed chunks; fileobj is closed when it finishes"""
+        job = UploadJob(batch_id, gateway_id, file_name)
+        with self._lock:
+            self.jobs[batch_id] = job
+        self.executor.submit(self._run, job, chunks, fileobj)
+        return job
+
+    def _run(self, job: UploadJob, chunks: Iterable["pd.DataFrame"], fileobj: BinaryIO):
+        job.status = "processing"
+        job.started_at = time.monotonic()
+        self.db.update_upload_batch(job.batch_id, 0, 0, 0, status="processing")
+
+        def on_progress(total: int, successful: int, failed: int):
+            job.total = total
+            job.successful = successful
+            job.failed = failed
+            self.db.update_upload_batch(job.batch_id, total, successful, failed)
+
+        try:
+            result = import_member_chunks(
+                self.db, chunks, job.gateway_id, job.batch_id, progress=on_progress
+            )
+            job.total = result['total']
+            job.successful = result['successful']
+            job.failed = result['failed']
+            job.errors = result['errors']
+            job.status = "completed"
+            self.db.update_gateway_sync(job.gateway_id)
+        except Exception as e:
+            print(f"Error importing upload {job.batch_id}: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.monotonic()
+            # Stop the parser before closing the file it reads
+            if hasattr(chunks, "close"):
+                chunks.close()
+            fileobj.close()
+            self.db.update_upload_batch(job.batch_id, job.total, job.successful,
+                                        job.failed, status=job.status)
+            self._prune()
+
+    def _prune(self):
+        with self._lock:
+            finished = [batch_id for batch_id, job in self.jobs.items()
+                        if job.status in ("completed", "failed")]
+            for batch_id in finished[:-MAX_FINISHED_JOBS]:
+                del self.jobs[batch_id]
+
+    def get_status(self, batch_id: str) -> Optional[Dict]:
+        """Get live progress of a job, falling back to the stored batch record"""
+        job = self.jobs.get(batch_id)
+        if job:
+            return job.to_dict()
+
+        batch = self.db.get_upload_batch(batch_id)
+        if not batch:
+            return None
+        return {
+            "batchId": batch['batch_id'],
+            "gatewayId": batch['gateway_id'],
+            "fileName": batch['file_name'],
+            "status": batch['status'],
+            "rowsProcessed": batch['total_records'],
+            "total": batch['total_records'],
+            "successful": batch['successful_records'],
+            "failed": batch['failed_records'],
+            "errors": [],
+            "error": None,
+            "queuedAt": batch['upload_date'],
+            "elapsedSeconds": None,
+            "rowsPerSecond": None
+        }
+
+    def shutdown(self):
+        """Wait for running imports to finish"""
+        self.executor.shutdown(wait=True)
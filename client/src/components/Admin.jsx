@@ -84,6 +84,17 @@ const Admin = () => {
         setUploadResult(null);
     };
 
+    const waitForUpload = async (batchId) => {
+        // Imports run as background jobs; poll until the batch finishes
+        while (true) {
+            const res = await axios.get(`${API_BASE_URL}/upload/${batchId}/status`);
+            if (res.data.status === 'completed' || res.data.status === 'failed') {
+                return res.data;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    };
+
     const handleUpload = async () => {
         if (!file) return;
 
@@ -97,8 +108,18 @@ const Admin = () => {
             const res = await axios.post(`${API_BASE_URL}/upload?gatewayId=${selectedGateway}`, formData, {
                 headers: { 'Content-Type': 'multipart/form-data' }
             });
+            const result = await waitForUpload(res.data.batchId);
+            if (result.status === 'failed') {
+                setUploadStatus('error');
+                setUploadResult({
+                    message: result.error || 'Upload failed',
+                    errors: result.errors || []
+                });
+                fetchUploadHistory();
+                return;
+            }
             setUploadStatus('success');
-            setUploadResult(res.data);
+            setUploadResult(result);
             fetchStats();
             fetchUploadHistory();
             setFile(null);
@@ -186,7 +207,7 @@ const Admin = () => {
                 <div className="file-input-wrapper">
                     <input
                         type="file"
-                        accept=".xlsx, .xls"
+                        accept=".xlsx, .csv"
                         onChange={handleFileChange}
                         id="file-upload"
                         className="file-input"
@@ -1,5 +1,5 @@
 
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
 import { motion } from 'framer-motion';
@@ -7,6 +7,15 @@ import { Clock, CheckSquare, TrendingUp, Loader2 } from 'lucide-react';
 import API_BASE_URL from '../config/api';
 import './Stats.css';
 
+// Member uploads publish one event per imported chunk; refetch at most this often
+const MEMBERS_REFETCH_DELAY = 5000;
+
+// The server's scanDate is its local date, so compare against the local date too
+const localDate = (date = new Date()) => {
+    const pad = (n) => String(n).padStart(2, '0');
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+};
+
 const Stats = () => {
     const [loading, setLoading] = useState(true);
     const [stats, setStats] = useState({
@@ -14,6 +23,7 @@ const Stats = () => {
         scannedToday: 0,
         members: []
     });
+    const refetchTimer = useRef(null);
 
     const fetchStats = async () => {
         try {
@@ -30,10 +40,46 @@ const Stats = () => {
         }
     };
 
+    // Apply a scan pushed by the server instead of refetching everything
+    const applyScan = (scan) => {
+        const today = localDate();
+        setStats(prev => ({
+            ...prev,
+            scannedToday: scan.scanDate === today ? prev.scannedToday + 1 : prev.scannedToday,
+            members: prev.members.map(m => (
+                m['QR Code ID'] === scan.qrCodeId
+                    ? { ...m, 'Last Scanned At': scan.scannedAt, 'Scan Count': scan.scanCount }
+                    : m
+            ))
+        }));
+    };
+
+    // Count added members straight away and coalesce the full refetches
+    const applyMembers = (change) => {
+        setStats(prev => ({ ...prev, totalMembers: prev.totalMembers + (change.added || 0) }));
+        if (refetchTimer.current) return;
+        refetchTimer.current = setTimeout(() => {
+            refetchTimer.current = null;
+            fetchStats();
+        }, MEMBERS_REFETCH_DELAY);
+    };
+
     useEffect(() => {
         fetchStats();
-        const interval = setInterval(fetchStats, 5000); // 5 sec poll
-        return () => clearInterval(interval);
+
+        // EventSource reconnects on its own and resumes from Last-Event-ID
+        const events = new EventSource(`${API_BASE_URL}/stats/stream`);
+        events.addEventListener('scan', (e) => applyScan(JSON.parse(e.data)));
+        events.addEventListener('members', (e) => applyMembers(JSON.parse(e.data)));
+        events.addEventListener('resync', fetchStats);
+
+        // Slow safety net in case the stream is unavailable
+        const interval = setInterval(fetchStats, 60000);
+        return () => {
+            events.close();
+            clearInterval(interval);
+            clearTimeout(refetchTimer.current);
+        };
     }, []);
 
     // Prepare chart data (e.g. scans per hour today)